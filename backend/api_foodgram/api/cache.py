@@ -0,0 +1,329 @@
+import hashlib
+import json
+import threading
+from collections import namedtuple
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+CART_VERSION_KEY = 'shopping_cart:{user_id}'
+DICTIONARY_VERSION_KEY = 'dictionary:{name}'
+CACHED_VERSION_KEY = 'version:{key}'
+INGREDIENTS = 'ingredients'
+TAGS = 'tags'
+DICTIONARIES = (INGREDIENTS, TAGS)
+DICTIONARY_SNAPSHOT_KEY = 'dictionary_snapshot:{name}:{version}'
+DICTIONARY_SNAPSHOT_TIMEOUT = 60 * 60 * 24
+SHOPPING_LIST_KEY = 'shopping_list:{user_id}:{version}:{file_format}'
+SHOPPING_LIST_TIMEOUT = 60 * 60 * 24
+SHOPPING_LIST_MAX_SIZE = 1024 * 1024
+RECIPES_VERSION_KEY = 'recipes'
+RECIPES_RESPONSE_KEY = 'recipes_response:{version}:{params}'
+
+DictionaryVersion = namedtuple('DictionaryVersion', ('tag', 'modified'))
+
+pending_versions = threading.local()
+
+
+def new_version():
+    """
+    Возвращает новое уникальное значение версии.
+
+    Возвращаемое значение
+    ---------------------
+    str
+    """
+    return uuid4().hex
+
+
+def get_version_row(key):
+    """
+    Возвращает запись версии из базы, при отсутствии создает ее.
+
+    Параметры
+    ---------
+    key: str
+        название версии
+
+    Возвращаемое значение
+    ---------------------
+    CacheVersion
+    """
+    from api.models import CacheVersion
+    return CacheVersion.objects.get_or_create(
+        key=key, defaults={'tag': new_version()}
+    )[0]
+
+
+def get_cached_version(key):
+    """
+    Возвращает версию из базы. Копия версии хранится в кэше
+    CACHE_VERSION_TIMEOUT секунд, поэтому процесс, в котором версия
+    не менялась, узнает о новой версии не позже чем через это время.
+
+    Параметры
+    ---------
+    key: str
+        название версии
+
+    Возвращаемое значение
+    ---------------------
+    DictionaryVersion
+        уникальный тег версии и время изменения в секундах
+    """
+    cached_key = CACHED_VERSION_KEY.format(key=key)
+    version = cache.get(cached_key)
+    if version is None:
+        row = get_version_row(key)
+        version = DictionaryVersion(row.tag, int(row.modified.timestamp()))
+        cache.set(cached_key, version, settings.CACHE_VERSION_TIMEOUT)
+    return version
+
+
+def bump_versions(keys):
+    """
+    Меняет версии в базе в текущей транзакции. Копии версий
+    в кэше процесса удаляются после фиксации транзакции.
+
+    Параметры
+    ---------
+    keys: Iterable[str]
+        названия версий
+    """
+    from api.models import CacheVersion
+    keys = set(keys)
+    if not keys:
+        return
+    tag, modified = new_version(), timezone.now()
+    updated = CacheVersion.objects.filter(key__in=keys).update(
+        tag=tag, modified=modified
+    )
+    if updated < len(keys):
+        CacheVersion.objects.bulk_create(
+            [
+                CacheVersion(key=key, tag=tag, modified=modified)
+                for key in keys
+            ],
+            ignore_conflicts=True
+        )
+    cached_keys = [CACHED_VERSION_KEY.format(key=key) for key in keys]
+    transaction.on_commit(lambda: cache.delete_many(cached_keys))
+
+
+def bump_versions_on_commit(keys):
+    """
+    Меняет версии после фиксации текущей транзакции. Версии,
+    измененные в одной транзакции несколько раз, меняются одним
+    запросом, и блокировка строк версий не держится до конца
+    транзакции.
+
+    Параметры
+    ---------
+    keys: Iterable[str]
+        названия версий
+    """
+    pending = getattr(pending_versions, 'keys', None)
+    if pending is None:
+        pending = pending_versions.keys = set()
+    pending.update(keys)
+    transaction.on_commit(bump_pending_versions)
+
+
+def bump_pending_versions():
+    """
+    Меняет версии, накопленные bump_versions_on_commit. Версии
+    из отмененных транзакций меняются вместе со следующими, лишняя
+    смена версии только сбрасывает кэш.
+    """
+    keys = getattr(pending_versions, 'keys', None)
+    pending_versions.keys = set()
+    if keys:
+        bump_versions(keys)
+
+
+def get_cart_version(user_id):
+    """
+    Возвращает текущую версию списка покупок пользователя. Версия
+    читается из базы при каждом запросе, поэтому изменение корзины
+    сразу видно всем процессам.
+
+    Параметры
+    ---------
+    user_id: int
+        id пользователя
+
+    Возвращаемое значение
+    ---------------------
+    str
+    """
+    return get_version_row(CART_VERSION_KEY.format(user_id=user_id)).tag
+
+
+def bump_cart_versions(user_ids):
+    """
+    Меняет версию списка покупок у переданных пользователей в текущей
+    транзакции, после чего ранее сохраненные файлы и ETag этих
+    пользователей становятся недействительными.
+
+    Параметры
+    ---------
+    user_ids: Iterable[int]
+        id пользователей
+    """
+    bump_versions(
+        CART_VERSION_KEY.format(user_id=user_id) for user_id in user_ids
+    )
+
+
+def get_dictionary_version(name):
+    """
+    Возвращает текущую версию справочника. Версия хранится в базе,
+    поэтому по ней процессы узнают об изменении справочника.
+
+    Параметры
+    ---------
+    name: str
+        название справочника
+
+    Возвращаемое значение
+    ---------------------
+    DictionaryVersion
+        уникальный тег версии и время изменения в секундах
+    """
+    return get_cached_version(DICTIONARY_VERSION_KEY.format(name=name))
+
+
+def bump_dictionary_version(name):
+    """
+    Меняет версию справочника в текущей транзакции.
+
+    Параметры
+    ---------
+    name: str
+        название справочника
+    """
+    bump_versions([DICTIONARY_VERSION_KEY.format(name=name)])
+
+
+def get_dictionary_snapshot_key(name, version):
+    """
+    Возвращает ключ кэша для готового JSON полного справочника.
+
+    Параметры
+    ---------
+    name: str
+        название справочника
+    version: DictionaryVersion
+        версия справочника
+
+    Возвращаемое значение
+    ---------------------
+    str
+    """
+    return DICTIONARY_SNAPSHOT_KEY.format(name=name, version=version.tag)
+
+
+def get_recipes_version():
+    """
+    Возвращает текущую версию выдачи рецептов. Версия хранится в базе
+    и меняется при изменении рецептов или связанных данных.
+
+    Возвращаемое значение
+    ---------------------
+    str
+    """
+    return get_cached_version(RECIPES_VERSION_KEY).tag
+
+
+def bump_recipes_version():
+    """
+    Меняет версию выдачи рецептов после фиксации текущей транзакции,
+    после чего сохраненные ответы становятся недействительными. Версия
+    общая для всей выдачи, поэтому ее строка не блокируется на время
+    транзакций, изменяющих рецепты.
+    """
+    bump_versions_on_commit([RECIPES_VERSION_KEY])
+
+
+def get_recipes_response_key(version, params):
+    """
+    Возвращает ключ кэша для ответа выдачи рецептов.
+
+    Параметры
+    ---------
+    version: str
+        версия выдачи рецептов
+    params: dict
+        нормализованные параметры запроса
+
+    Возвращаемое значение
+    ---------------------
+    str
+    """
+    digest = hashlib.md5(
+        json.dumps(params, sort_keys=True).encode()
+    ).hexdigest()
+    return RECIPES_RESPONSE_KEY.format(version=version, params=digest)
+
+
+def get_shopping_list_key(user_id, version, file_format):
+    """
+    Возвращает ключ кэша для файла списка покупок.
+
+    Параметры
+    ---------
+    user_id: int
+        id пользователя
+    version: str
+        версия списка покупок
+    file_format: str
+        формат файла
+
+    Возвращаемое значение
+    ---------------------
+    str
+    """
+    return SHOPPING_LIST_KEY.format(
+        user_id=user_id, version=version, file_format=file_format
+    )
+
+
+def cache_stream(stream, key, timeout=SHOPPING_LIST_TIMEOUT,
+                 max_size=SHOPPING_LIST_MAX_SIZE):
+    """
+    Отдает части потока без изменений и по окончании сохраняет
+    собранный документ в кэш. Документы больше max_size не кэшируются
+    и не накапливаются в памяти.
+
+    Параметры
+    ---------
+    stream: Iterable[bytes | str]
+        части документа
+    key: str
+        ключ кэша
+    timeout: int
+        время хранения в секундах
+    max_size: int
+        максимальный размер кэшируемого документа в байтах
+
+    Возвращаемое значение
+    ---------------------
+    Iterator[bytes]
+    """
+    chunks = []
+    size = 0
+    for chunk in stream:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        if chunks is not None:
+            size += len(chunk)
+            if size > max_size:
+                chunks = None
+            else:
+                chunks.append(chunk)
+        yield chunk
+    if chunks is not None:
+        cache.set(key, b''.join(chunks), timeout)
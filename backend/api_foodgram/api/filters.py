@@ -1,7 +1,12 @@
+from django.db import connections
+from django.db.models.functions import Upper
+
 import django_filters
 
 from recipes.models import Recipes
 
+from rest_framework import filters
+
 
 class RecipesFilters(django_filters.rest_framework.FilterSet):
     """
@@ -88,3 +93,49 @@ class RecipesFilters(django_filters.rest_framework.FilterSet):
             'is_favorited',
             'is_in_shopping_cart',
         ]
+
+
+class IngredientsSearchFilter(filters.SearchFilter):
+    """
+    Класс поиска ингридиентов по началу названия без учета регистра.
+
+    В PostgreSQL условие строится как UPPER(name) LIKE 'ТЕРМИН%', чтобы
+    запрос обслуживался функциональным индексом по UPPER(name). В других
+    базах UPPER может менять регистр только латиницы, поэтому там
+    используется обычный istartswith.
+
+    ...
+
+    Методы
+    ------
+    filter_queryset(request, queryset, view):
+        Фильтрует ингридиенты по началу названия.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        """
+        Фильтрует ингридиенты по началу названия.
+
+        Параметры
+        ---------
+        request: Request
+        queryset: Queryset[Ingredients]
+        view: IngredientsViewSet
+
+        Возвращаемое значение
+        ---------------------
+        Queryset[Ingredients]
+        """
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+        if connections[queryset.db].vendor != 'postgresql':
+            for search_term in search_terms:
+                queryset = queryset.filter(name__istartswith=search_term)
+            return queryset
+        queryset = queryset.alias(name_upper=Upper('name'))
+        for search_term in search_terms:
+            queryset = queryset.filter(
+                name_upper__startswith=search_term.upper()
+            )
+        return queryset
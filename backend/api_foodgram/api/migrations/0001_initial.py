@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheVersion',
+            fields=[
+                ('key', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Название версии')),
+                ('tag', models.CharField(max_length=32, verbose_name='Значение версии')),
+                ('modified', models.DateTimeField(auto_now=True, verbose_name='Время изменения')),
+            ],
+            options={
+                'verbose_name': 'Версия кэша',
+                'verbose_name_plural': 'Версии кэша',
+            },
+        ),
+    ]
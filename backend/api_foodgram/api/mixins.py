@@ -0,0 +1,240 @@
+import gzip
+import re
+
+from api.cache import (DICTIONARY_SNAPSHOT_TIMEOUT,
+                       get_dictionary_snapshot_key, get_dictionary_version,
+                       get_recipes_response_key, get_recipes_version)
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+class DictionaryCacheMixin:
+    """
+    Примесь для вьюсетов справочников, добавляющая HTTP кэширование.
+
+    Ответы получают заголовки ETag, Last-Modified и Cache-Control
+    по версии справочника. Условный запрос с совпадающей версией
+    получает ответ 304, пока копия версии в кэше, без обращения
+    к базе данных. Полный список
+    без параметров отдается из готового JSON, который сериализуется
+    один раз на версию справочника и хранится в кэше вместе со сжатой
+    gzip копией.
+
+    ...
+
+    Атрибуты
+    --------
+    dictionary: str
+        название справочника
+    dictionary_version: DictionaryVersion
+        версия справочника, по которой обрабатывается запрос
+
+    Методы
+    ------
+    conditional_response(request, handler, *args, **kwargs):
+        Отдает 304 или ответ handler с заголовками кэширования.
+    get_snapshot():
+        Возвращает готовый JSON полного списка и его gzip копию.
+    snapshot_list(request, *args, **kwargs):
+        Отдает полный список из готового JSON.
+    uncached_list(request, *args, **kwargs):
+        Отдает список без использования готового JSON.
+    """
+    dictionary = None
+    dictionary_version = None
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        """
+        Отдает 304 или ответ handler с заголовками кэширования.
+
+        Параметры
+        ---------
+        request: Request
+        handler: callable
+            обработчик запроса вьюсета
+
+        Возвращаемое значение
+        ---------------------
+        Response
+        """
+        version = get_dictionary_version(self.dictionary)
+        self.dictionary_version = version
+        etag = f'W/"{self.dictionary}-{version.tag}"'
+        response = get_conditional_response(
+            request, etag=etag, last_modified=version.modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(version.modified)
+        patch_cache_control(
+            response, public=True, max_age=settings.DICTIONARY_CACHE_MAX_AGE
+        )
+        return response
+
+    def get_snapshot(self):
+        """
+        Возвращает готовый JSON полного списка и его gzip копию,
+        при отсутствии в кэше сериализует справочник и сохраняет.
+
+        Возвращаемое значение
+        ---------------------
+        dict
+            байты по ключам json и gzip
+        """
+        key = get_dictionary_snapshot_key(
+            self.dictionary, self.dictionary_version
+        )
+        snapshot = cache.get(key)
+        if snapshot is None:
+            serializer = self.get_serializer(self.get_queryset(), many=True)
+            content = JSONRenderer().render(serializer.data)
+            snapshot = {'json': content, 'gzip': gzip.compress(content)}
+            cache.set(key, snapshot, DICTIONARY_SNAPSHOT_TIMEOUT)
+        return snapshot
+
+    def snapshot_list(self, request, *args, **kwargs):
+        """
+        Отдает полный список из готового JSON. Запросы с параметрами
+        и запросы не в формате JSON обрабатываются uncached_list.
+
+        Параметры
+        ---------
+        request: Request
+
+        Возвращаемое значение
+        ---------------------
+        HttpResponse
+        """
+        if request.query_params or request.accepted_renderer.format != 'json':
+            return self.uncached_list(request, *args, **kwargs)
+        snapshot = self.get_snapshot()
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if ACCEPTS_GZIP.search(accept_encoding):
+            response = HttpResponse(
+                snapshot['gzip'], content_type='application/json'
+            )
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(
+                snapshot['json'], content_type='application/json'
+            )
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    def uncached_list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, self.snapshot_list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, super().retrieve, *args, **kwargs
+        )
+
+
+class AnonymousCacheMixin:
+    """
+    Примесь для вьюсета рецептов, кэширующая ответы list и retrieve
+    для неавторизованных пользователей.
+
+    Ответ сохраняется в общий кэш по версии выдачи рецептов и
+    нормализованным параметрам запроса, версия меняется сигналами
+    при изменении рецептов. Запросы с параметрами не из
+    cache_query_params в кэш не попадают, чтобы ссылки пагинации
+    в сохраненном ответе совпадали с запросом.
+
+    ...
+
+    Атрибуты
+    --------
+    cache_query_params: tuple[str]
+        параметры запроса, от которых зависит ответ
+
+    Методы
+    ------
+    get_response_cache_key(request, **kwargs):
+        Возвращает ключ кэша ответа или None, если ответ не кэшируется.
+    cached_response(request, handler, *args, **kwargs):
+        Отдает ответ из кэша или ответ handler, сохраняя его в кэш.
+    """
+    cache_query_params = ()
+
+    def get_response_cache_key(self, request, **kwargs):
+        """
+        Возвращает ключ кэша ответа или None, если ответ не кэшируется.
+
+        Параметры
+        ---------
+        request: Request
+        kwargs: dict
+            параметры маршрута
+
+        Возвращаемое значение
+        ---------------------
+        str | None
+        """
+        if request.user.is_authenticated:
+            return None
+        if not set(request.query_params).issubset(self.cache_query_params):
+            return None
+        params = {
+            name: sorted(set(request.query_params.getlist(name)))
+            for name in request.query_params
+        }
+        params.update(
+            action=self.action,
+            kwargs=kwargs,
+            host=request.get_host(),
+            secure=request.is_secure(),
+            format=request.accepted_renderer.format,
+        )
+        return get_recipes_response_key(get_recipes_version(), params)
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        """
+        Отдает ответ из кэша или ответ handler, сохраняя его в кэш.
+
+        Параметры
+        ---------
+        request: Request
+        handler: callable
+            обработчик запроса вьюсета
+
+        Возвращаемое значение
+        ---------------------
+        Response
+        """
+        key = self.get_response_cache_key(request, **kwargs)
+        if key is None:
+            return handler(request, *args, **kwargs)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RECIPES_CACHE_TIMEOUT)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, super().retrieve, *args, **kwargs
+        )
@@ -0,0 +1,41 @@
+from django.db import models
+
+
+class CacheVersion(models.Model):
+    """
+    Модель версий закэшированных данных.
+
+    Версия хранится в базе и меняется в той же транзакции, что и
+    данные, поэтому ее видят все процессы независимо от настроек кэша.
+
+    ...
+
+    Атрибуты
+    --------
+    key: str
+        Название версии
+    tag: str
+        Уникальное значение версии
+    modified: datetime
+        Время изменения
+    """
+    key = models.CharField(
+        max_length=100,
+        primary_key=True,
+        verbose_name='Название версии'
+    )
+    tag = models.CharField(
+        max_length=32,
+        verbose_name='Значение версии'
+    )
+    modified = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Время изменения'
+    )
+
+    class Meta:
+        verbose_name = 'Версия кэша'
+        verbose_name_plural = 'Версии кэша'
+
+    def __str__(self):
+        return f'{self.key}: {self.tag}'
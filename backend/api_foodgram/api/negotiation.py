@@ -0,0 +1,77 @@
+from rest_framework.exceptions import NotFound
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.utils.mediatypes import (media_type_matches,
+                                             order_by_precedence)
+
+
+class FileContentNegotiation(DefaultContentNegotiation):
+    """
+    Класс согласования формата для выгрузки файлов.
+
+    Ответы с ошибками всегда отдаются первым рендерером вьюсета (JSON),
+    а формат самого файла выбирается методом select_file_format,
+    поэтому параметр ?format= не должен совпадать с рендерерами DRF.
+
+    ...
+
+    Методы
+    ------
+    select_renderer(request, renderers, format_suffix=None):
+        Возвращает первый рендерер из списка.
+    select_file_format(request, formats, default):
+        Выбирает формат файла по параметру ?format= или заголовку Accept.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        """
+        Возвращает первый рендерер из списка.
+
+        Параметры
+        ---------
+        request: Request
+        renderers: list
+            рендереры вьюсета
+
+        Возвращаемое значение
+        ---------------------
+        tuple
+        """
+        renderer = renderers[0]
+        return renderer, renderer.media_type
+
+    def select_file_format(self, request, formats, default):
+        """
+        Выбирает формат файла по параметру ?format= или заголовку Accept.
+        Если заголовок не совпадает ни с одним форматом, отдается формат
+        по умолчанию.
+
+        Параметры
+        ---------
+        request: Request
+        formats: dict
+            поддерживаемые форматы и их media type без параметров
+        default: str
+            формат по умолчанию
+
+        Возвращаемое значение
+        ---------------------
+        str
+        """
+        file_format = request.query_params.get(
+            self.settings.URL_FORMAT_OVERRIDE
+        )
+        if file_format:
+            if file_format not in formats:
+                raise NotFound(
+                    {'errors': f'Формат {file_format} не поддерживается'}
+                )
+            return file_format
+        accepts = self.get_accept_list(request)
+        for media_type_set in order_by_precedence(accepts):
+            for media_type in media_type_set:
+                if media_type.split(';')[0].strip() == '*/*':
+                    continue
+                for file_format, content_type in formats.items():
+                    if media_type_matches(content_type, media_type):
+                        return file_format
+        return default
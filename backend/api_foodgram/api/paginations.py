@@ -1,8 +1,196 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import (EmptyPage, InvalidPage, Page,
+                                   PageNotAnInteger, Paginator)
+from django.db import connections
+from django.utils.functional import cached_property
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+COUNT_KEY = 'pagination_count:{query}'
+FALSE_VALUES = ('false', '0', 'no')
+
+
+def get_estimated_count(queryset):
+    """
+    Возвращает оценку количества строк таблицы из статистики PostgreSQL
+    для queryset без условий. Для остальных баз и запросов с условиями
+    возвращает None.
+
+    Параметры
+    ---------
+    queryset: Queryset
+
+    Возвращаемое значение
+    ---------------------
+    int | None
+    """
+    query = queryset.query
+    connection = connections[queryset.db]
+    if (connection.vendor != 'postgresql' or query.where
+            or query.distinct or query.combinator):
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+def get_approximate_count(queryset):
+    """
+    Возвращает количество строк queryset. Для больших таблиц без условий
+    берется оценка PostgreSQL, иначе точное количество, сохраненное
+    в кэш на PAGINATION_COUNT_TIMEOUT секунд по тексту запроса.
+
+    Параметры
+    ---------
+    queryset: Queryset
+
+    Возвращаемое значение
+    ---------------------
+    int
+    """
+    estimate = get_estimated_count(queryset)
+    if estimate is not None and estimate >= settings.PAGINATION_ESTIMATE_MIN:
+        return estimate
+    sql, params = queryset.query.sql_with_params()
+    key = COUNT_KEY.format(
+        query=hashlib.md5(repr((sql, params)).encode()).hexdigest()
+    )
+    return cache.get_or_set(
+        key, queryset.count, settings.PAGINATION_COUNT_TIMEOUT
+    )
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Класс пагинатора, считающий количество строк через
+    get_approximate_count.
+    """
+
+    @cached_property
+    def count(self):
+        return get_approximate_count(self.object_list)
+
+
+class UncountedPage(Page):
+    """
+    Класс страницы, о следующей странице которой известно
+    без подсчета общего количества строк.
+    """
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+
+class UncountedPaginator(Paginator):
+    """
+    Класс пагинатора без подсчета количества строк. Страница читается
+    с одной лишней строкой, по которой определяется наличие следующей.
+    """
+    count = None
+
+    def page(self, number):
+        """
+        Возвращает страницу с номером number.
+
+        Параметры
+        ---------
+        number: int | str
+
+        Возвращаемое значение
+        ---------------------
+        UncountedPage
+        """
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы должен быть числом')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('На странице нет результатов')
+        return UncountedPage(
+            rows[:self.per_page], number, self, len(rows) > self.per_page
+        )
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     """
     Класс изменяющий поле page_size модели PageNumberPagination на limit.
+
+    С параметром ?count=false общее количество не считается и в ответе
+    равно null. При включенной настройке PAGINATION_APPROXIMATE_COUNT
+    количество берется из оценки PostgreSQL или из кэша.
+    """
+    page_size_query_param = 'limit'
+    count_query_param = 'count'
+
+    def is_count_enabled(self, request):
+        """
+        Проверяет, нужно ли считать общее количество.
+
+        Параметры
+        ---------
+        request: Request
+
+        Возвращаемое значение
+        ---------------------
+        bool
+        """
+        value = request.query_params.get(self.count_query_param, '')
+        return value.lower() not in FALSE_VALUES
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.is_count_enabled(request):
+            if settings.PAGINATION_APPROXIMATE_COUNT:
+                self.django_paginator_class = ApproximateCountPaginator
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        page_number = request.query_params.get(self.page_query_param, 1)
+        try:
+            self.page = UncountedPaginator(queryset, page_size).page(
+                page_number
+            )
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        return list(self.page)
+
+
+class RecipesCursorPagination(CursorPagination):
+    """
+    Класс пагинации рецептов по курсору.
+
+    Страница выбирается условием по дате публикации вместо OFFSET и
+    без подсчета общего количества рецептов, поэтому время ответа не
+    зависит от глубины страницы. Рецепты с одинаковой датой
+    упорядочиваются по id, курсоры next и previous стабильны при
+    добавлении новых рецептов.
     """
+    ordering = ('-pub_date', '-id')
     page_size_query_param = 'limit'
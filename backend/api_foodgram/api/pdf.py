@@ -0,0 +1,121 @@
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics, ttfonts
+from reportlab.pdfgen import canvas
+
+FONT_NAME = 'Arial'
+FONT_FILE = os.path.join('fonts', 'arial.ttf')
+
+TITLE = 'Список покупок:'
+TITLE_FONT_SIZE = 24
+TEXT_FONT_SIZE = 14
+TITLE_X = 100
+TITLE_Y = 700
+TEXT_X = 120
+FIRST_LINE_Y = 680
+PAGE_TOP_Y = A4[1] - 50
+PAGE_BOTTOM_Y = 50
+LINE_HEIGHT = 20
+
+CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_SIZE = 1024 * 1024
+
+_font_lock = threading.Lock()
+_font_registered = False
+
+
+def register_font():
+    """
+    Регистрирует TTF шрифт в reportlab один раз на процесс.
+    Файл шрифта разбирается при первом вызове, последующие вызовы
+    из любых потоков используют уже зарегистрированный шрифт.
+
+    Возвращаемое значение
+    ---------------------
+    str
+        имя зарегистрированного шрифта
+    """
+    global _font_registered
+    if _font_registered:
+        return FONT_NAME
+    with _font_lock:
+        if not _font_registered:
+            pdfmetrics.registerFont(
+                ttfonts.TTFont(
+                    FONT_NAME, os.path.join(settings.STATIC_ROOT, FONT_FILE)
+                )
+            )
+            _font_registered = True
+    return FONT_NAME
+
+
+def render_shopping_list(shopping_list, output):
+    """
+    Рисует список покупок в PDF, автоматически перенося строки
+    на новую страницу, когда текущая заканчивается.
+
+    Параметры
+    ---------
+    shopping_list: Iterable[dict]
+        строки списка покупок с ключами name, measurement_unit и total
+    output: file
+        файловый обьект, в который записывается документ
+
+    Возвращаемое значение
+    ---------------------
+    int
+        количество страниц в документе
+    """
+    font = register_font()
+    pdf = canvas.Canvas(output, pagesize=A4, pageCompression=1)
+    pdf.setFont(font, TITLE_FONT_SIZE)
+    pdf.drawString(TITLE_X, TITLE_Y, TITLE)
+    pdf.setFont(font, TEXT_FONT_SIZE)
+    pages = 1
+    y = FIRST_LINE_Y
+    for num, item in enumerate(shopping_list, start=1):
+        if y < PAGE_BOTTOM_Y:
+            pdf.showPage()
+            pdf.setFont(font, TEXT_FONT_SIZE)
+            pages += 1
+            y = PAGE_TOP_Y
+        pdf.drawString(
+            TEXT_X, y,
+            f'{num}. {item["name"]} {item["total"]} '
+            f'{item["measurement_unit"]}'
+        )
+        y -= LINE_HEIGHT
+    pdf.showPage()
+    pdf.save()
+    return pages
+
+
+def stream_shopping_list(shopping_list, chunk_size=CHUNK_SIZE):
+    """
+    Генератор PDF документа со списком покупок для StreamingHttpResponse.
+    Документ собирается во временном файле, который держится в памяти
+    только пока он небольшой, и отдается частями по chunk_size байт.
+    Частями отдается только готовый документ: холст reportlab хранит
+    сжатые страницы в памяти до save(), поэтому память на отрисовку
+    растет с числом строк списка.
+
+    Параметры
+    ---------
+    shopping_list: Iterable[dict]
+        строки списка покупок с ключами name, measurement_unit и total
+    chunk_size: int
+        размер отдаваемой части документа в байтах
+
+    Возвращаемое значение
+    ---------------------
+    Iterator[bytes]
+    """
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as buffer:
+        render_shopping_list(shopping_list, buffer)
+        buffer.seek(0)
+        yield from iter(lambda: buffer.read(chunk_size), b'')
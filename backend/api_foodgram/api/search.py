@@ -0,0 +1,292 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import Counter, namedtuple
+
+from api.cache import INGREDIENTS, get_dictionary_version
+
+from recipes.models import Ingredients
+
+MODE_PREFIX = 'prefix'
+MODE_FUZZY = 'fuzzy'
+
+MAX_CHAR = chr(0x10FFFF)
+NGRAM_SIZE = 2
+FUZZY_LIMIT = 20
+WORD_SEPARATOR = re.compile(r'[\W_]+')
+
+MIN_TYPO_LENGTH = 4
+
+IndexData = namedtuple('IndexData', ('keys', 'rows', 'words', 'ngrams'))
+
+
+def get_ngrams(value):
+    """
+    Возвращает множество n-грамм строки.
+
+    Параметры
+    ---------
+    value: str
+
+    Возвращаемое значение
+    ---------------------
+    set[str]
+    """
+    return {
+        value[start:start + NGRAM_SIZE]
+        for start in range(len(value) - NGRAM_SIZE + 1)
+    }
+
+
+def within_one_edit(first, second):
+    """
+    Проверяет, что строки отличаются не более чем одной вставкой,
+    удалением или заменой символа.
+
+    Параметры
+    ---------
+    first: str
+    second: str
+
+    Возвращаемое значение
+    ---------------------
+    bool
+    """
+    if abs(len(first) - len(second)) > 1:
+        return False
+    if len(first) > len(second):
+        first, second = second, first
+    for position, (left, right) in enumerate(zip(first, second)):
+        if left != right:
+            if len(first) == len(second):
+                return first[position + 1:] == second[position + 1:]
+            return first[position:] == second[position + 1:]
+    return True
+
+
+def has_typo_match(query, words):
+    """
+    Проверяет, что одно из слов названия начинается со строки,
+    отличающейся от запроса не более чем на одну правку.
+
+    Параметры
+    ---------
+    query: str
+        запрос
+    words: tuple[str]
+        слова названия
+
+    Возвращаемое значение
+    ---------------------
+    bool
+    """
+    lengths = (len(query) - 1, len(query), len(query) + 1)
+    return any(
+        within_one_edit(query, word[:length])
+        for word in words
+        for length in lengths
+        if 0 < length <= len(word)
+    )
+
+
+class IngredientsIndex:
+    """
+    Индекс ингридиентов в памяти процесса.
+
+    Ингридиенты хранятся отсортированными по названию без учета
+    регистра, поэтому поиск по префиксу сводится к двум бинарным
+    поискам. Для нечеткого поиска дополнительно строится индекс
+    n-грамм названий. Индекс перестраивается, когда меняется общая
+    версия справочника ингридиентов.
+
+    ...
+
+    Методы
+    ------
+    search(prefix, limit=None):
+        Возвращает ингридиенты, название которых начинается с prefix.
+    fuzzy_search(query, limit=FUZZY_LIMIT):
+        Возвращает ингридиенты, ранжированные по близости к запросу.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = IndexData([], [], [], {})
+
+    def _build(self, version):
+        """
+        Загружает ингридиенты из базы и строит индекс.
+
+        Параметры
+        ---------
+        version: str
+            версия справочника, для которой строится индекс
+        """
+        rows = sorted(
+            Ingredients.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda row: (row['name'].casefold(), row['id'])
+        )
+        keys = [row['name'].casefold() for row in rows]
+        words = [
+            tuple(word for word in WORD_SEPARATOR.split(key) if word)
+            for key in keys
+        ]
+        ngrams = {}
+        for position, key in enumerate(keys):
+            for ngram in get_ngrams(key):
+                ngrams.setdefault(ngram, []).append(position)
+        self._data = IndexData(keys, rows, words, ngrams)
+        self._version = version
+
+    def _get_data(self):
+        """
+        Возвращает актуальные данные индекса, при необходимости
+        перестраивая его.
+
+        Возвращаемое значение
+        ---------------------
+        IndexData
+        """
+        version = get_dictionary_version(INGREDIENTS)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._build(version)
+        return self._data
+
+    def search(self, prefix, limit=None):
+        """
+        Возвращает ингридиенты, название которых начинается с prefix
+        без учета регистра.
+
+        Параметры
+        ---------
+        prefix: str
+            начало названия
+        limit: int
+            максимальное количество результатов
+
+        Возвращаемое значение
+        ---------------------
+        list[dict]
+        """
+        data = self._get_data()
+        prefix = prefix.strip().casefold()
+        start = bisect_left(data.keys, prefix)
+        stop = bisect_left(data.keys, prefix + MAX_CHAR, start)
+        if limit is not None:
+            stop = min(stop, start + limit)
+        return data.rows[start:stop]
+
+    @staticmethod
+    def _get_substring_candidates(data, query):
+        """
+        Отбирает по индексу n-грамм позиции названий, содержащих
+        все n-граммы запроса.
+
+        Параметры
+        ---------
+        data: IndexData
+        query: str
+
+        Возвращаемое значение
+        ---------------------
+        Iterable[int]
+        """
+        query_ngrams = get_ngrams(query)
+        if not query_ngrams:
+            return range(len(data.keys))
+        postings = sorted(
+            (data.ngrams.get(ngram, ()) for ngram in query_ngrams), key=len
+        )
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+        return sorted(candidates)
+
+    @staticmethod
+    def _get_typo_candidates(data, query):
+        """
+        Отбирает по индексу n-грамм позиции названий, которые могут
+        содержать запрос с одной правкой: одна правка меняет не больше
+        NGRAM_SIZE n-грамм запроса, поэтому у подходящего названия
+        остается хотя бы одна и не меньше чем на NGRAM_SIZE меньше
+        различных n-грамм запроса.
+
+        Параметры
+        ---------
+        data: IndexData
+        query: str
+
+        Возвращаемое значение
+        ---------------------
+        Iterable[int]
+        """
+        if len(query) - NGRAM_SIZE + 1 <= NGRAM_SIZE:
+            return range(len(data.keys))
+        query_ngrams = get_ngrams(query)
+        required = max(1, len(query_ngrams) - NGRAM_SIZE)
+        counter = Counter()
+        for ngram in query_ngrams:
+            counter.update(data.ngrams.get(ngram, ()))
+        return sorted(
+            position for position, count in counter.items()
+            if count >= required
+        )
+
+    def fuzzy_search(self, query, limit=FUZZY_LIMIT):
+        """
+        Возвращает ингридиенты, ранжированные по близости к запросу:
+        сначала совпадения по началу названия, затем по началу слова,
+        затем по подстроке и в конце совпадения с одной опечаткой.
+        Внутри ранга порядок совпадает с сортировкой по названию.
+        Следующий ранг вычисляется, только если результатов не хватает
+        до limit, опечатки учитываются для запросов от MIN_TYPO_LENGTH
+        символов.
+
+        Параметры
+        ---------
+        query: str
+            строка поиска
+        limit: int
+            максимальное количество результатов
+
+        Возвращаемое значение
+        ---------------------
+        list[dict]
+        """
+        data = self._get_data()
+        query = query.strip().casefold()
+        if not query:
+            return []
+        start = bisect_left(data.keys, query)
+        stop = bisect_left(data.keys, query + MAX_CHAR, start)
+        found = list(range(start, min(stop, start + limit)))
+        if len(found) < limit:
+            word_matches = []
+            substring_matches = []
+            for position in self._get_substring_candidates(data, query):
+                if start <= position < stop:
+                    continue
+                if query not in data.keys[position]:
+                    continue
+                words = data.words[position]
+                if any(word.startswith(query) for word in words):
+                    word_matches.append(position)
+                else:
+                    substring_matches.append(position)
+            found.extend(word_matches)
+            found.extend(substring_matches)
+        if len(found) < limit and len(query) >= MIN_TYPO_LENGTH:
+            seen = set(found)
+            found.extend(
+                position
+                for position in self._get_typo_candidates(data, query)
+                if position not in seen
+                and has_typo_match(query, data.words[position])
+            )
+        return [data.rows[position] for position in found[:limit]]
+
+
+ingredients_index = IngredientsIndex()
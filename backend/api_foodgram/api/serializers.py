@@ -1,18 +1,77 @@
 import base64
+import binascii
+import tempfile
 
-from api import paginations
+from PIL import Image
 
+from api.cache import bump_cart_versions
+from api.services import RECIPES_PREVIEW_LIMIT
+from api.signals import users_with_recipe_in_cart
+
+from django.conf import settings
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
-from django.core.files.base import ContentFile
+from django.core.files import File
+from django.core.files.storage import default_storage
 from django.db import transaction
 
+from recipes.images import RENDITIONS, get_rendition_name
 from recipes.models import IngredientInRecipe, Ingredients, Recipes, Tags
 
 from rest_framework import serializers
 
 from users.models import User
 
+IMAGE_DECODE_CHUNK = 64 * 1024
+IMAGE_SPOOL_SIZE = 1024 * 1024
+
+
+def get_subscribed_authors(request):
+    """
+    Возвращает множество id авторов, на которых подписан пользователь
+    сделавший запрос. Множество загружается одним запросом и
+    сохраняется в обьекте запроса, поэтому все сериализаторы
+    в рамках одного ответа используют его повторно.
+
+    Параметры
+    ---------
+    request: Request
+        запрос пользователя
+
+    Возвращаемое значение
+    ---------------------
+    set
+    """
+    subscribed = getattr(request, '_subscribed_authors', None)
+    if subscribed is None:
+        subscribed = set(
+            request.user.subscribe_user.values_list('author_id', flat=True)
+        )
+        request._subscribed_authors = subscribed
+    return subscribed
+
+
+def get_recipes_limit(request):
+    """
+    Возвращает количество рецептов автора в подписках из параметра
+    recipes_limit. Некорректное значение заменяется значением
+    по умолчанию, как и в пагинации.
+
+    Параметры
+    ---------
+    request: Request
+        запрос пользователя
+
+    Возвращаемое значение
+    ---------------------
+    int
+    """
+    try:
+        limit = int(request.query_params['recipes_limit'])
+    except (KeyError, ValueError):
+        return RECIPES_PREVIEW_LIMIT
+    return limit if limit > 0 else RECIPES_PREVIEW_LIMIT
+
 
 class SignUpSerializer(serializers.ModelSerializer):
     """
@@ -63,7 +122,8 @@ class SignUpSerializer(serializers.ModelSerializer):
     def get_is_subscribed(self, obj) -> bool:
         """
         Проверяет наличие связки пользователя сделавшего запрос
-        и автора в модели Subscriptions
+        и автора в модели Subscriptions по множеству подписок,
+        загруженному один раз на запрос.
 
         Параметры
         ---------
@@ -74,10 +134,9 @@ class SignUpSerializer(serializers.ModelSerializer):
         ---------------------
         Bool
         """
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return user.subscribe_user.filter(
-                author=obj).exists()
+        request = self.context['request']
+        if request.user.is_authenticated:
+            return obj.id in get_subscribed_authors(request)
         return False
 
     def to_representation(self, instance):
@@ -168,6 +227,95 @@ class IngredientRecipeRepresentationSerializer(IngredientsSerializer):
         }
 
 
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Поле id, которое при валидации списка берет обьекты из словаря,
+    загруженного BulkPrimaryKeyListSerializer одним запросом, вместо
+    отдельного запроса на каждый элемент. Сообщения об ошибках
+    совпадают с PrimaryKeyRelatedField.
+
+    ...
+
+    Атрибуты
+    --------
+    objects: dict | None
+        обьекты по первичному ключу или None вне валидации списка
+    """
+    objects = None
+
+    def to_internal_value(self, data):
+        if self.objects is None:
+            return super().to_internal_value(data)
+        pk = self.to_pk(data)
+        if pk is None:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        obj = self.objects.get(pk)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+    def to_pk(self, data):
+        """
+        Приводит значение к типу первичного ключа модели.
+
+        Параметры
+        ---------
+        data: Any
+            значение из запроса
+
+        Возвращаемое значение
+        ---------------------
+        Any | None
+            первичный ключ или None для некорректного значения
+        """
+        if isinstance(data, (bool, dict, list)):
+            return None
+        try:
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except ValidationError:
+            return None
+
+
+class BulkPrimaryKeyListSerializer(serializers.ListSerializer):
+    """
+    Класс сериализации списка, который перед валидацией элементов
+    загружает все указанные в них обьекты поля id одним запросом id__in.
+
+    ...
+
+    Методы
+    ------
+    to_internal_value(data):
+        Загружает обьекты и валидирует элементы списка.
+    """
+
+    def to_internal_value(self, data):
+        """
+        Загружает обьекты и валидирует элементы списка.
+
+        Параметры
+        ---------
+        data: list
+            элементы из запроса
+
+        Возвращаемое значение
+        ---------------------
+        list
+        """
+        if not isinstance(data, list):
+            return super().to_internal_value(data)
+        field = self.child.fields['id']
+        pks = {
+            field.to_pk(self.child.get_pk_value(item)) for item in data
+        }
+        pks.discard(None)
+        field.objects = field.get_queryset().in_bulk(pks)
+        try:
+            return super().to_internal_value(data)
+        finally:
+            field.objects = None
+
+
 class IngredientsInRecipeSerializer(serializers.ModelSerializer):
     """
     Класс сериализации модели связующий модели между Recipes и Ingredients.
@@ -179,14 +327,36 @@ class IngredientsInRecipeSerializer(serializers.ModelSerializer):
     --------
     id: int
         номер ингридиента в базе
+
+    Методы
+    ------
+    get_pk_value(data):
+        Возвращает id ингридиента из элемента запроса.
     """
-    id = serializers.PrimaryKeyRelatedField(
+    id = BulkPrimaryKeyRelatedField(
         queryset=Ingredients.objects.all(),
         error_messages={'does_not_exist': 'Ингридиента нет в базе'})
 
     class Meta:
         model = IngredientInRecipe
         fields = ('id', 'amount')
+        list_serializer_class = BulkPrimaryKeyListSerializer
+
+    @staticmethod
+    def get_pk_value(data):
+        """
+        Возвращает id ингридиента из элемента запроса.
+
+        Параметры
+        ---------
+        data: dict
+            элемент из запроса
+
+        Возвращаемое значение
+        ---------------------
+        Any
+        """
+        return data.get('id') if isinstance(data, dict) else None
 
 
 class TagsSerializer(serializers.ModelSerializer):
@@ -202,10 +372,12 @@ class TagsSerializer(serializers.ModelSerializer):
 
     Методы
     ------
+    get_pk_value(data):
+        Возвращает id тега из элемента запроса.
     to_internal_value(data):
         Пересобирает ответ убирая вложенность значений.
     """
-    id = serializers.PrimaryKeyRelatedField(
+    id = BulkPrimaryKeyRelatedField(
         queryset=Tags.objects.all(),
         error_messages={'does_not_exist': 'Тега нет в базе'})
 
@@ -213,6 +385,23 @@ class TagsSerializer(serializers.ModelSerializer):
         model = Tags
         read_only_fields = ('name', 'color', 'slug')
         fields = ('id', 'name', 'color', 'slug')
+        list_serializer_class = BulkPrimaryKeyListSerializer
+
+    @staticmethod
+    def get_pk_value(data):
+        """
+        Возвращает id тега из элемента запроса.
+
+        Параметры
+        ---------
+        data: int
+            элемент из запроса
+
+        Возвращаемое значение
+        ---------------------
+        int
+        """
+        return data
 
     def to_internal_value(self, data):
         """
@@ -234,13 +423,93 @@ class TagsSerializer(serializers.ModelSerializer):
 class Base64ImageField(serializers.ImageField):
     """
     Сериализатор поля с картинкой [image]
+
+    Картинка в формате data:image/...;base64 декодируется частями
+    во временный файл, который остается в памяти только пока он
+    небольшой. Размер проверяется до декодирования, а число пикселей
+    по заголовку картинки, не распаковывая ее.
+
+    ...
+
+    Методы
+    ------
+    decode(encoded, name):
+        Декодирует base64 строку во временный файл.
+    check_pixels(file):
+        Проверяет число пикселей картинки.
     """
+    default_error_messages = {
+        'max_size': 'Размер картинки не должен превышать {max_size} байт',
+        'max_pixels': (
+            'Картинка не должна быть больше {max_pixels} пикселей'
+        ),
+    }
+
+    def decode(self, encoded, name):
+        """
+        Декодирует base64 строку во временный файл.
+
+        Параметры
+        ---------
+        encoded: str
+            картинка в base64
+        name: str
+            имя файла
+
+        Возвращаемое значение
+        ---------------------
+        File
+        """
+        encoded = ''.join(encoded.split())
+        max_size = settings.RECIPE_IMAGE_MAX_SIZE
+        if len(encoded) // 4 * 3 > max_size + 2:
+            self.fail('max_size', max_size=max_size)
+        buffer = tempfile.SpooledTemporaryFile(max_size=IMAGE_SPOOL_SIZE)
+        try:
+            for start in range(0, len(encoded), IMAGE_DECODE_CHUNK):
+                buffer.write(base64.b64decode(
+                    encoded[start:start + IMAGE_DECODE_CHUNK]
+                ))
+        except (binascii.Error, ValueError):
+            buffer.close()
+            self.fail('invalid_image')
+        if buffer.tell() > max_size:
+            buffer.close()
+            self.fail('max_size', max_size=max_size)
+        buffer.seek(0)
+        return File(buffer, name=name)
+
+    def check_pixels(self, file):
+        """
+        Проверяет число пикселей картинки по ее заголовку.
+
+        Параметры
+        ---------
+        file: File
+            файл картинки
+        """
+        max_pixels = settings.RECIPE_IMAGE_MAX_PIXELS
+        try:
+            with Image.open(file) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            width, height = max_pixels + 1, 1
+        except Exception:
+            file.close()
+            self.fail('invalid_image')
+        file.seek(0)
+        if width * height > max_pixels:
+            file.close()
+            self.fail('max_pixels', max_pixels=max_pixels)
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
+            format, _, imgstr = data.partition(';base64,')
+            if not imgstr:
+                self.fail('invalid_image')
             ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = self.decode(imgstr, 'temp.' + ext)
+            self.check_pixels(data)
         return super().to_internal_value(data)
 
 
@@ -257,12 +526,20 @@ class RecipeMinifiedSerializer(serializers.ModelSerializer):
         название рецепта
     image: dict
         картинка зашифрованная в формат base64
+    image_renditions: dict
+        ссылки на уменьшенные копии картинки
+
+    Методы
+    ------
+    get_image_renditions(obj):
+        Возвращает ссылки на уменьшенные копии картинки.
     """
     name = serializers.CharField(
         min_length=2,
         max_length=200
     )
     image = Base64ImageField()
+    image_renditions = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipes
@@ -270,15 +547,47 @@ class RecipeMinifiedSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'image',
+            'image_renditions',
             'cooking_time',
         )
         fields = (
             'id',
             'name',
             'image',
+            'image_renditions',
             'cooking_time',
         )
 
+    def get_image_renditions(self, obj):
+        """
+        Возвращает ссылки на уменьшенные копии картинки. Пока копии
+        не готовы, все ссылки ведут на исходную картинку.
+
+        Параметры
+        ---------
+        obj: Recipes
+            рецепт
+
+        Возвращаемое значение
+        ---------------------
+        dict | None
+        """
+        if not obj.image:
+            return None
+        ready = obj.has_renditions()
+        request = self.context.get('request')
+        urls = {}
+        for rendition in RENDITIONS:
+            url = obj.image.url
+            if ready:
+                url = default_storage.url(
+                    get_rendition_name(obj.image.name, rendition)
+                )
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls[rendition] = url
+        return urls
+
 
 class RecipesSerializer(RecipeMinifiedSerializer):
     """
@@ -308,8 +617,10 @@ class RecipesSerializer(RecipeMinifiedSerializer):
     to_representation(instance):
         Меняет сериализатор для выдачи. Добавляя расширенные данные
         по полю ingredients.
-    __create_or_update_obj(recipe, tags, ingredients):
-        Функция для корректного обновления или создания рецепта
+    __set_tags(recipe, tags, created=False):
+        Приводит теги рецепта к переданному списку.
+    __set_ingredients(recipe, ingredients, created=False):
+        Приводит ингридиенты рецепта к переданному списку.
     create(validated_data):
         Функция создания рецепта
     update(instance, validated_data):
@@ -342,6 +653,7 @@ class RecipesSerializer(RecipeMinifiedSerializer):
         read_only_fields = (
             'id',
             'author',
+            'image_renditions',
             'is_favorited',
             'is_in_shopping_cart',
         )
@@ -352,6 +664,7 @@ class RecipesSerializer(RecipeMinifiedSerializer):
             'ingredients',
             'name',
             'image',
+            'image_renditions',
             'text',
             'cooking_time',
             'is_favorited',
@@ -379,9 +692,10 @@ class RecipesSerializer(RecipeMinifiedSerializer):
         return res
 
     @staticmethod
-    def __create_or_update_obj(recipe, tags, ingredients):
+    def __set_tags(recipe, tags, created=False):
         """
-        Функция для корректного обновления или создания рецепта
+        Приводит теги рецепта к переданному списку: удаляет лишние
+        связи одним запросом и добавляет недостающие одной вставкой.
 
         Параметры
         ---------
@@ -389,26 +703,83 @@ class RecipesSerializer(RecipeMinifiedSerializer):
             обьект модели Recipe
         tags: list
             список тегов
+        created: bool
+            рецепт только что создан и связей у него нет
+        """
+        through = Recipes.tags.through
+        tag_ids = [tag['id'].id for tag in tags]
+        current = set()
+        if not created:
+            current = set(
+                through.objects.filter(recipes=recipe).
+                values_list('tags_id', flat=True)
+            )
+        removed = current.difference(tag_ids)
+        if removed:
+            through.objects.filter(
+                recipes=recipe, tags_id__in=removed
+            ).delete()
+        through.objects.bulk_create([
+            through(recipes_id=recipe.pk, tags_id=tag_id)
+            for tag_id in tag_ids if tag_id not in current
+        ])
+
+    @staticmethod
+    def __set_ingredients(recipe, ingredients, created=False):
+        """
+        Приводит ингридиенты рецепта к переданному списку: удаляет
+        лишние одним запросом, меняет количество одним bulk_update
+        и добавляет недостающие одной вставкой.
+
+        Параметры
+        ---------
+        recipe: Queryset[Recipe]
+            обьект модели Recipe
         ingredients: list
             список ингридиентов
+        created: bool
+            рецепт только что создан и ингридиентов у него нет
 
         Возвращаемое значение
         ---------------------
-        Queryset[Recipe]
+        bool
+            изменился ли состав рецепта
         """
-        for tag in tags:
-            recipe.tags.add(tag['id'])
-        ingredients_in_recipe = []
-        for ingredient in ingredients:
-            ingredients_in_recipe.append(
-                IngredientInRecipe(
-                    ingredient=ingredient['id'],
-                    recipe=recipe,
-                    amount=ingredient['amount']
-                )
+        amounts = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        current = {}
+        if not created:
+            current = {
+                row.ingredient_id: row
+                for row in IngredientInRecipe.objects.filter(recipe=recipe)
+            }
+        removed = current.keys() - amounts.keys()
+        if removed:
+            IngredientInRecipe.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        changed = []
+        for ingredient_id, row in current.items():
+            amount = amounts.get(ingredient_id, row.amount)
+            if row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        if changed:
+            IngredientInRecipe.objects.bulk_update(changed, ['amount'])
+        added = [
+            IngredientInRecipe(
+                ingredient_id=ingredient_id,
+                recipe=recipe,
+                amount=amount
             )
-        IngredientInRecipe.objects.bulk_create(ingredients_in_recipe)
-        return recipe
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in current
+        ]
+        if added:
+            IngredientInRecipe.objects.bulk_create(added)
+        return bool(removed or changed or added)
 
     @transaction.atomic
     def create(self, validated_data):
@@ -426,12 +797,17 @@ class RecipesSerializer(RecipeMinifiedSerializer):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         recipe = super().create(validated_data)
-        return self.__create_or_update_obj(recipe, tags, ingredients)
+        self.__set_tags(recipe, tags, created=True)
+        self.__set_ingredients(recipe, ingredients, created=True)
+        return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
         """
-        Функция обработки PATCH запроса
+        Функция обработки PATCH запроса. Теги и ингридиенты меняются
+        только если переданы в запросе, и только на разницу с текущими.
+        Изменение состава рецепта меняет версии списков покупок,
+        в которые он входит.
 
         Параметры
         ---------
@@ -444,12 +820,16 @@ class RecipesSerializer(RecipeMinifiedSerializer):
         ---------------------
         Queryset[Recipe]
         """
-        tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('ingredients')
-        instance.tags.clear()
-        instance.ingredients.clear()
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
         recipe = super().update(instance, validated_data)
-        return self.__create_or_update_obj(recipe, tags, ingredients)
+        if tags is not None:
+            self.__set_tags(recipe, tags)
+        if ingredients is not None and self.__set_ingredients(
+            recipe, ingredients
+        ):
+            bump_cart_versions(users_with_recipe_in_cart(recipe.pk))
+        return recipe
 
     def validate(self, attrs):
         """
@@ -464,11 +844,10 @@ class RecipesSerializer(RecipeMinifiedSerializer):
         ---------------------
         dict
         """
-        no_uniq_recipe = (
-            self.context['request'].user.recipes.
-            filter(name=attrs['name']).exists()
-        )
-        if self.context['request'].method == 'POST' and no_uniq_recipe:
+        request = self.context['request']
+        if request.method == 'POST' and request.user.recipes.filter(
+            name=attrs['name']
+        ).exists():
             raise serializers.ValidationError(
                 {'name': 'Вы уже создали такой рецепт'}
             )
@@ -534,6 +913,8 @@ class RecipesSerializer(RecipeMinifiedSerializer):
         """
         Функция обработки поля is_favorited на основе
         связи пользователя и рецепта через модель FavoriteRecipes.
+        Если queryset уже аннотирован во вьюсете, используется
+        готовое значение без дополнительного запроса.
 
         Параметры
         ---------
@@ -543,6 +924,9 @@ class RecipesSerializer(RecipeMinifiedSerializer):
         ---------------------
         bool
         """
+        annotated = getattr(obj, 'is_favorited', None)
+        if annotated is not None:
+            return annotated
         user = self.context['request'].user
         if user.is_authenticated:
             return user.favoriterecipes_set.filter(recipe=obj).exists()
@@ -552,6 +936,8 @@ class RecipesSerializer(RecipeMinifiedSerializer):
         """
         Функция обработки поля is_in_shopping_cart на основе
         связи пользователя и рецепта через модель ShoppingCart.
+        Если queryset уже аннотирован во вьюсете, используется
+        готовое значение без дополнительного запроса.
 
         Параметры
         ---------
@@ -561,6 +947,9 @@ class RecipesSerializer(RecipeMinifiedSerializer):
         ---------------------
         bool
         """
+        annotated = getattr(obj, 'is_in_shopping_cart', None)
+        if annotated is not None:
+            return annotated
         user = self.context['request'].user
         if user.is_authenticated:
             return user.shoppingcart_set.filter(recipe=obj).exists()
@@ -584,7 +973,7 @@ class SubscriptionsSerializer(SignUpSerializer):
     Методы
     ------
     paginate_recipes(obj):
-        Добавляет поджинацию при ответе на запрос.
+        Возвращает первые recipes_limit рецептов автора.
     """
     recipes = serializers.SerializerMethodField(
         'paginate_recipes', read_only=True
@@ -618,7 +1007,9 @@ class SubscriptionsSerializer(SignUpSerializer):
 
     def paginate_recipes(self, obj):
         """
-        Добавляет поджинацию при ответе на запрос.
+        Возвращает первые recipes_limit рецептов автора. Рецепты,
+        загруженные заранее attach_recipe_previews, берутся из атрибута
+        recipe_previews, иначе выполняется запрос.
 
         Параметры
         ---------
@@ -630,13 +1021,13 @@ class SubscriptionsSerializer(SignUpSerializer):
         dict
 
         """
-        recipe = obj.recipes.all()
-        paginator = paginations.CustomPageNumberPagination()
-        paginator.page_size_query_param = 'recipes_limit'
-        paginator.page_size = 3
-        page = paginator.paginate_queryset(recipe, self.context['request'])
+        recipes = getattr(obj, 'recipe_previews', None)
+        if recipes is None:
+            recipes = obj.recipes.all()[
+                :get_recipes_limit(self.context['request'])
+            ]
         serializer = RecipeMinifiedSerializer(
-            page,
+            recipes,
             many=True,
             context={'request': self.context['request']})
         return serializer.data
@@ -0,0 +1,146 @@
+import csv
+
+from api.pdf import TITLE, stream_shopping_list as stream_pdf
+
+from django.db.models import F, Sum, Window
+from django.db.models.functions import RowNumber
+
+from recipes.models import IngredientInRecipe, Recipes
+
+CSV_HEADER = ('Ингридиент', 'Количество', 'Единица измерения')
+RECIPES_PREVIEW_LIMIT = 3
+
+
+def get_shopping_list(user):
+    """
+    Собирает список покупок пользователя одним запросом: количество
+    каждого ингридиента суммируется на стороне базы данных.
+
+    Параметры
+    ---------
+    user: Queryset[User]
+        пользователь сделавший запрос
+
+    Возвращаемое значение
+    ---------------------
+    Queryset[dict]
+        словари с ключами name, measurement_unit и total,
+        отсортированные по названию ингридиента
+    """
+    return (
+        IngredientInRecipe.objects.filter(
+            recipe__shoppingcart__user=user
+        ).
+        values(
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+        ).
+        annotate(total=Sum('amount')).
+        order_by('name', 'measurement_unit')
+    )
+
+
+def attach_recipe_previews(authors, limit=RECIPES_PREVIEW_LIMIT):
+    """
+    Загружает одним запросом первые limit рецептов каждого автора
+    и сохраняет их в атрибут recipe_previews. Рецепты нумеруются
+    оконной функцией ROW_NUMBER() в порядке выдачи рецептов
+    отдельно для каждого автора.
+
+    Параметры
+    ---------
+    authors: list[User]
+        авторы
+    limit: int
+        количество рецептов автора
+
+    Возвращаемое значение
+    ---------------------
+    list[User]
+    """
+    previews = {author.pk: [] for author in authors}
+    if previews and limit > 0:
+        numbered = Recipes.objects.filter(
+            author_id__in=previews
+        ).annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=F('author_id'),
+                order_by=(F('pub_date').desc(), F('id').desc()),
+            )
+        ).values(
+            'id', 'name', 'image', 'renditions_source', 'cooking_time',
+            'author_id', 'row_number'
+        )
+        sql, params = numbered.query.sql_with_params()
+        recipes = Recipes.objects.raw(
+            f'SELECT * FROM ({sql}) AS numbered '
+            f'WHERE numbered.row_number <= %s '
+            f'ORDER BY numbered.row_number',
+            (*params, limit)
+        )
+        for recipe in recipes:
+            previews[recipe.author_id].append(recipe)
+    for author in authors:
+        author.recipe_previews = previews[author.pk]
+    return authors
+
+
+class Echo:
+    """
+    Псевдо-буфер для csv.writer: вместо записи возвращает строку,
+    чтобы CSV можно было отдавать генератором.
+    """
+
+    def write(self, value):
+        return value
+
+
+def stream_text(shopping_list):
+    """
+    Генератор списка покупок в виде простого текста.
+
+    Параметры
+    ---------
+    shopping_list: Iterable[dict]
+        строки списка покупок с ключами name, measurement_unit и total
+
+    Возвращаемое значение
+    ---------------------
+    Iterator[str]
+    """
+    yield f'{TITLE}\n'
+    for num, item in enumerate(shopping_list, start=1):
+        yield (
+            f'{num}. {item["name"]} {item["total"]} '
+            f'{item["measurement_unit"]}\n'
+        )
+
+
+def stream_csv(shopping_list):
+    """
+    Генератор списка покупок в формате CSV.
+
+    Параметры
+    ---------
+    shopping_list: Iterable[dict]
+        строки списка покупок с ключами name, measurement_unit и total
+
+    Возвращаемое значение
+    ---------------------
+    Iterator[str]
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for item in shopping_list:
+        yield writer.writerow(
+            (item['name'], item['total'], item['measurement_unit'])
+        )
+
+
+SHOPPING_LIST_FORMATS = {
+    'pdf': ('application/pdf', stream_pdf),
+    'txt': ('text/plain; charset=utf-8', stream_text),
+    'csv': ('text/csv; charset=utf-8', stream_csv),
+}
+DEFAULT_SHOPPING_LIST_FORMAT = 'pdf'
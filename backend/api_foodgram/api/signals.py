@@ -0,0 +1,183 @@
+from api.cache import (DICTIONARIES, INGREDIENTS, TAGS, bump_cart_versions,
+                       bump_dictionary_version, bump_recipes_version)
+
+from django.apps import apps as global_apps
+from django.db.models.signals import (m2m_changed, post_delete, post_migrate,
+                                      post_save)
+from django.dispatch import receiver
+
+from import_export.signals import post_import
+
+from recipes.images import renditions_ready
+from recipes.models import (IngredientInRecipe, Ingredients, Recipes,
+                            ShoppingCart, Tags)
+
+from users.models import User
+
+DICTIONARY_MODELS = {
+    Ingredients: INGREDIENTS,
+    Tags: TAGS,
+}
+AUTHOR_FIELDS = frozenset(('email', 'username', 'first_name', 'last_name'))
+
+
+def users_with_recipe_in_cart(recipe_id):
+    """
+    Возвращает id пользователей, у которых рецепт в списке покупок.
+
+    Параметры
+    ---------
+    recipe_id: int
+        id рецепта
+
+    Возвращаемое значение
+    ---------------------
+    Queryset[int]
+    """
+    return ShoppingCart.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('user_id', flat=True)
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_changed(sender, instance, **kwargs):
+    """Меняет версию списка покупок владельца корзины."""
+    bump_cart_versions([instance.user_id])
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+def ingredient_in_recipe_changed(sender, instance, **kwargs):
+    """
+    Меняет версии списков покупок, в которые входит измененный рецепт.
+
+    На удаление строк сигнал не подписан, чтобы каскадное удаление
+    выполнялось одним запросом без сигнала на каждую строку. При
+    удалении рецепта версии меняются удалением строк корзины, при
+    изменении состава рецепта через API - сериализатором рецепта.
+    Ингридиент, который входит в рецепты, удалить нельзя.
+    """
+    bump_cart_versions(
+        users_with_recipe_in_cart(instance.recipe_id)
+    )
+
+
+@receiver(m2m_changed, sender=Recipes.ingredients.through)
+def recipe_ingredients_changed(sender, instance, action, reverse, pk_set,
+                               **kwargs):
+    """
+    Меняет версии списков покупок при изменении ингридиентов рецепта
+    через менеджер Recipes.ingredients. При очистке связей рецепты
+    определяются до удаления строк.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif pk_set is not None:
+        recipe_ids = pk_set
+    else:
+        recipe_ids = IngredientInRecipe.objects.filter(
+            ingredient=instance
+        ).values_list('recipe_id', flat=True)
+    bump_cart_versions(
+        ShoppingCart.objects.filter(
+            recipe_id__in=list(recipe_ids)
+        ).values_list('user_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Ingredients)
+@receiver(post_delete, sender=Ingredients)
+@receiver(post_save, sender=Tags)
+@receiver(post_delete, sender=Tags)
+def dictionary_changed(sender, instance, **kwargs):
+    """Меняет версию справочника ингридиентов или тегов."""
+    bump_dictionary_version(DICTIONARY_MODELS[sender])
+
+
+@receiver(post_import)
+def dictionary_imported(sender, model, **kwargs):
+    """
+    Меняет версию справочника после импорта через import_export,
+    в том числе при пакетной записи без сигналов модели.
+    """
+    if model in DICTIONARY_MODELS:
+        bump_dictionary_version(DICTIONARY_MODELS[model])
+
+
+@receiver(post_migrate)
+def dictionaries_migrated(sender, apps=global_apps, **kwargs):
+    """
+    Меняет версии справочников после миграций, которые могли
+    изменить данные. Сигнал отправляется для каждого приложения,
+    версии меняются один раз, если таблица версий уже создана.
+    """
+    if sender.name != 'api':
+        return
+    try:
+        apps.get_model('api', 'CacheVersion')
+    except LookupError:
+        return
+    for name in DICTIONARIES:
+        bump_dictionary_version(name)
+
+
+@receiver(post_save, sender=Recipes)
+@receiver(post_delete, sender=Recipes)
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_save, sender=Ingredients)
+@receiver(post_delete, sender=Ingredients)
+@receiver(post_save, sender=Tags)
+@receiver(post_delete, sender=Tags)
+def recipes_changed(sender, **kwargs):
+    """
+    Меняет версию выдачи рецептов при изменении рецептов, их
+    ингридиентов или справочников, данные которых входят в выдачу.
+    """
+    bump_recipes_version()
+
+
+@receiver(renditions_ready)
+def recipe_renditions_ready(sender, **kwargs):
+    """
+    Меняет версию выдачи рецептов, когда готовы уменьшенные копии
+    картинки, чтобы в выдаче появились ссылки на них.
+    """
+    bump_recipes_version()
+
+
+@receiver(m2m_changed, sender=Recipes.tags.through)
+@receiver(m2m_changed, sender=Recipes.ingredients.through)
+def recipe_relations_changed(sender, action, **kwargs):
+    """Меняет версию выдачи рецептов при изменении связей рецепта."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_recipes_version()
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Меняет версию выдачи рецептов при изменении данных автора,
+    которые входят в выдачу. Новые пользователи, изменения других
+    полей и пользователи без рецептов пропускаются. Удаление автора
+    меняет версию через удаление его рецептов.
+    """
+    if created:
+        return
+    fields = AUTHOR_FIELDS
+    if update_fields is not None:
+        fields = fields.intersection(update_fields)
+    changed = instance.pop_changed_fields(fields)
+    if changed and Recipes.objects.filter(author=instance).exists():
+        bump_recipes_version()
+
+
+@receiver(post_import)
+def recipes_imported(sender, model, **kwargs):
+    """
+    Меняет версию выдачи рецептов после импорта рецептов или
+    справочников.
+    """
+    if model is Recipes or model in DICTIONARY_MODELS:
+        bump_recipes_version()
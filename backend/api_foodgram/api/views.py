@@ -1,30 +1,39 @@
-from api.filters import RecipesFilters
-from api.paginations import CustomPageNumberPagination
+from api.cache import (INGREDIENTS, TAGS, cache_stream, get_cart_version,
+                       get_shopping_list_key)
+from api.filters import IngredientsSearchFilter, RecipesFilters
+from api.mixins import AnonymousCacheMixin, DictionaryCacheMixin
+from api.negotiation import FileContentNegotiation
+from api.paginations import (CustomPageNumberPagination,
+                             RecipesCursorPagination)
 from api.permissions import ReadAnyOrAuthorOnly
+from api.search import (FUZZY_LIMIT, MODE_FUZZY, MODE_PREFIX,
+                        ingredients_index)
 from api.serializers import (IngredientsSerializer, RecipeMinifiedSerializer,
                              RecipesSerializer, SetPasswordSerializer,
                              SignUpSerializer, SubscriptionsSerializer,
-                             TagsSerializer)
+                             TagsSerializer, get_recipes_limit)
+from api.services import (DEFAULT_SHOPPING_LIST_FORMAT,
+                          SHOPPING_LIST_FORMATS, attach_recipe_previews,
+                          get_shopping_list)
 
-from api_foodgram.settings import STATIC_ROOT
-
-from django.db.models import Count
-from django.http import HttpResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Prefetch
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
 
 from django_filters.rest_framework import DjangoFilterBackend
 
 from recipes.models import (FavoriteRecipes, IngredientInRecipe, Ingredients,
                             Recipes, ShoppingCart, Tags)
 
-from reportlab.pdfbase import pdfmetrics, ttfonts
-from reportlab.pdfgen import canvas
-
-from rest_framework import filters, mixins, status, viewsets
+from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.viewsets import GenericViewSet
 
 from users.models import User
@@ -137,19 +146,18 @@ class BaseUserViewSet(mixins.CreateModelMixin,
         ---------------------
         dict
         """
-        subscriptions = (
-            User.objects.filter(
-                subscribe_author__user=self.request.user).
-            prefetch_related('recipes').
-            annotate(recipes_count=Count('recipes')).order_by('id')
+        subscriptions = User.objects.filter(
+            subscribe_author__user=self.request.user
+        ).order_by('id')
+        page = attach_recipe_previews(
+            self.paginate_queryset(subscriptions),
+            get_recipes_limit(self.request)
         )
-        page = self.paginate_queryset(subscriptions)
         serializer = SubscriptionsSerializer(
+            page,
             context={'request': self.request},
-            data=page,
             many=True
         )
-        serializer.is_valid()
         return self.get_paginated_response(serializer.data)
 
     @action(
@@ -180,12 +188,7 @@ class BaseUserViewSet(mixins.CreateModelMixin,
                 raise ValidationError(
                     {'errors': 'Нельзя подписаться на самого себя'}
                 )
-            author = get_object_or_404(
-                User.objects.prefetch_related('recipes').
-                annotate(recipes_count=Count('recipes')).
-                order_by('id'),
-                id=autor_id
-            )
+            author = get_object_or_404(User, id=autor_id)
             is_subscribed = (
                 user.subscribe_user.filter(author=author).exists())
             if is_subscribed:
@@ -216,26 +219,90 @@ class BaseUserViewSet(mixins.CreateModelMixin,
         )
 
 
-class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientsViewSet(DictionaryCacheMixin, viewsets.ReadOnlyModelViewSet):
     """
-    Класс обработки GET запроса Ingredients
+    Класс обработки GET запроса Ingredients. Ответы кэшируются
+    по версии справочника ингридиентов.
+
+    ...
+
+    Методы
+    ------
+    get_limit():
+        Возвращает ограничение количества результатов из параметра limit.
+    uncached_list(request, *args, **kwargs):
+        Отдает ингридиенты, при поиске по названию использует
+        индекс в памяти процесса, поддерживает нечеткий поиск.
     """
 
     queryset = Ingredients.objects.all()
     serializer_class = IngredientsSerializer
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['^name', ]
+    filter_backends = [IngredientsSearchFilter]
     pagination_class = None
+    dictionary = INGREDIENTS
+    limit_query_param = 'limit'
+    mode_query_param = 'mode'
+
+    def get_limit(self):
+        """
+        Возвращает ограничение количества результатов из параметра limit.
+        Некорректное значение игнорируется, как и в пагинации.
+
+        Возвращаемое значение
+        ---------------------
+        int | None
+        """
+        try:
+            limit = int(self.request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return None
+        return limit if limit > 0 else None
 
+    def uncached_list(self, request, *args, **kwargs):
+        """
+        Отдает ингридиенты. Поиск по началу названия обслуживается
+        индексом в памяти процесса, если он включен настройкой
+        INGREDIENTS_SEARCH_INDEX. С параметром ?mode=fuzzy выполняется
+        ранжированный нечеткий поиск, он всегда использует индекс.
+
+        Параметры
+        ---------
+        request: Request
 
-class TagsViewSet(viewsets.ReadOnlyModelViewSet):
+        Возвращаемое значение
+        ---------------------
+        list[dict]
+        """
+        name = request.query_params.get(api_settings.SEARCH_PARAM, '')
+        mode = request.query_params.get(self.mode_query_param, MODE_PREFIX)
+        if mode not in (MODE_PREFIX, MODE_FUZZY):
+            raise ValidationError(
+                {'mode': f'Допустимые значения: {MODE_PREFIX}, {MODE_FUZZY}'}
+            )
+        limit = self.get_limit()
+        if mode == MODE_FUZZY and name.strip():
+            return Response(
+                ingredients_index.fuzzy_search(name, limit or FUZZY_LIMIT)
+            )
+        if settings.INGREDIENTS_SEARCH_INDEX and name.strip():
+            return Response(ingredients_index.search(name, limit))
+        queryset = self.filter_queryset(self.get_queryset())
+        if limit is not None:
+            queryset = queryset[:limit]
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+
+class TagsViewSet(DictionaryCacheMixin, viewsets.ReadOnlyModelViewSet):
     """
-    Класс обработки GET запроса Tags
+    Класс обработки GET запроса Tags. Ответы кэшируются
+    по версии справочника тегов.
     """
 
     queryset = Tags.objects.all()
     serializer_class = TagsSerializer
     pagination_class = None
+    dictionary = TAGS
 
 
 def post_delete_method(self, request, pk, model):
@@ -280,16 +347,45 @@ def post_delete_method(self, request, pk, model):
     )
 
 
-class RecipesViewSet(viewsets.ModelViewSet):
+class RecipesViewSet(AnonymousCacheMixin, viewsets.ModelViewSet):
     """
-    Класс обработки выдачи рецептов.
+    Класс обработки выдачи рецептов. Выдача для неавторизованных
+    пользователей кэшируется по версии рецептов.
+
+    ...
+
+    Методы
+    ------
+    paginator:
+        Возвращает пагинатор по номеру страницы или по курсору.
+    get_queryset():
+        Подгружает связанные данные рецептов и добавляет признаки
+        is_favorited и is_in_shopping_cart для пользователя
+        сделавшего запрос.
+    refresh_instance(serializer):
+        Перечитывает сохраненный рецепт через get_queryset.
+    perform_create(serializer):
+        Создает рецепт и перечитывает его для ответа.
+    perform_update(serializer):
+        Обновляет рецепт и перечитывает его для ответа.
     """
-    queryset = Recipes.objects.all()
+    queryset = Recipes.objects.select_related('author').prefetch_related(
+        'tags',
+        Prefetch(
+            'recipe_ingredients',
+            queryset=IngredientInRecipe.objects.select_related('ingredient')
+        ),
+    )
     serializer_class = RecipesSerializer
     pagination_class = CustomPageNumberPagination
     permission_classes = (ReadAnyOrAuthorOnly,)
     filter_backends = [DjangoFilterBackend, ]
     filterset_class = RecipesFilters
+    cache_query_params = (
+        'tags', 'author', 'page', 'limit', 'count', 'pagination', 'cursor'
+    )
+    pagination_mode_query_param = 'pagination'
+    cursor_pagination_mode = 'cursor'
     http_method_names = [
         'get',
         'post',
@@ -300,8 +396,76 @@ class RecipesViewSet(viewsets.ModelViewSet):
         'trace'
     ]
 
+    @property
+    def paginator(self):
+        """
+        Возвращает пагинатор по номеру страницы или, с параметром
+        ?pagination=cursor, пагинатор по курсору, упорядоченный
+        по дате публикации.
+
+        Возвращаемое значение
+        ---------------------
+        BasePagination
+        """
+        if not hasattr(self, '_paginator'):
+            mode = self.request.query_params.get(
+                self.pagination_mode_query_param
+            )
+            if mode == self.cursor_pagination_mode:
+                self._paginator = RecipesCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_queryset(self):
+        """
+        Подгружает автора, теги и ингридиенты рецептов фиксированным
+        числом запросов и добавляет признаки is_favorited и
+        is_in_shopping_cart подзапросами EXISTS, чтобы не делать
+        отдельный запрос на каждый рецепт при сериализации.
+
+        Возвращаемое значение
+        ---------------------
+        Queryset[Recipes]
+        """
+        queryset = super().get_queryset()
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset
+        return queryset.annotate(
+            is_favorited=Exists(
+                FavoriteRecipes.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )
+            ),
+        )
+
+    def refresh_instance(self, serializer):
+        """
+        Перечитывает сохраненный рецепт через get_queryset, чтобы ответ
+        на запись собирался с теми же подгрузками, что и выдача.
+
+        Параметры
+        ---------
+        serializer: RecipesSerializer
+            сериализатор с сохраненным рецептом
+        """
+        serializer.instance = self.get_queryset().get(
+            pk=serializer.instance.pk
+        )
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+        self.refresh_instance(serializer)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        self.refresh_instance(serializer)
 
     @action(
         methods=['POST', 'DELETE'],
@@ -332,49 +496,50 @@ class RecipesViewSet(viewsets.ModelViewSet):
         detail=False,
         permission_classes=(IsAuthenticated,),
         url_path='download_shopping_cart',
+        content_negotiation_class=FileContentNegotiation,
     )
     def download_shopping_cart(self, request):
         """
-        Функция выдает PDF файл со списком покупок.
+        Функция выдает файл со списком покупок. Формат выбирается
+        параметром ?format=pdf|txt|csv или заголовком Accept,
+        по умолчанию PDF.
+
+        Готовый файл кэшируется по версии списка покупок пользователя,
+        версия меняется при изменении корзины или рецептов в ней.
+        Повторный запрос с совпадающим If-None-Match получает ответ 304.
         """
-        ing = (
-            IngredientInRecipe.objects.filter(
-                recipe__shoppingcart__user=self.request.user
-            )
+        file_format = self.get_content_negotiator().select_file_format(
+            request,
+            {
+                name: content_type.split(';')[0]
+                for name, (content_type, _) in SHOPPING_LIST_FORMATS.items()
+            },
+            DEFAULT_SHOPPING_LIST_FORMAT
         )
-        if not ing.exists():
-            raise ValidationError(
-                {'errors': 'У вас нет рецептов с списке покупок'}
-            )
-        res = {}
-        for i in ing:
-            value = res.get(i.ingredient.name)
-            if value is not None:
-                value[1] += i.amount
-            else:
-                res.update(
-                    {
-                        i.ingredient.name:
-                            [i.ingredient.measurement_unit, i.amount]
-                    }
+        user = self.request.user
+        version = get_cart_version(user.id)
+        etag = f'"{version}-{file_format}"'
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        content_type, stream = SHOPPING_LIST_FORMATS[file_format]
+        key = get_shopping_list_key(user.id, version, file_format)
+        content = cache.get(key)
+        if content is not None:
+            response = HttpResponse(content, content_type=content_type)
+        else:
+            shopping_list = get_shopping_list(user)
+            if not shopping_list.exists():
+                raise ValidationError(
+                    {'errors': 'У вас нет рецептов с списке покупок'}
                 )
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="file.pdf"'
-
-        p = canvas.Canvas(response)
-        my_font_object = ttfonts.TTFont(
-            'Arial', f'{STATIC_ROOT}/fonts/arial.ttf'
+            response = StreamingHttpResponse(
+                cache_stream(stream(shopping_list.iterator()), key),
+                content_type=content_type
+            )
+        response['Content-Disposition'] = (
+            f'attachment; filename="file.{file_format}"'
         )
-        pdfmetrics.registerFont(my_font_object)
-        p.setFont('Arial', 24)
-        p.drawString(100, 700, 'Список покупок:')
-        p.setFont('Arial', 14)
-        x = 680
-        num = 1
-        for key, val in res.items():
-            p.drawString(120, x, f'{num}. {key} {val[1]} {val[0]}')
-            x -= 20
-            num += 1
-        p.showPage()
-        p.save()
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
         return response
@@ -103,6 +103,27 @@ DATABASES = {
     }
 }
 
+# Кэш ответов. По умолчанию кэш в памяти процесса, для общего
+# кэша задаются CACHE_BACKEND и CACHE_LOCATION, например
+# django.core.cache.backends.filebased.FileBasedCache и путь к каталогу
+# или backend Redis/Memcached и адрес сервера.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
+# Версии кэшированных данных хранятся в базе, процесс держит копию
+# версии в кэше CACHE_VERSION_TIMEOUT секунд, поэтому изменения
+# из других процессов видны не позже чем через это время
+CACHE_VERSION_TIMEOUT = int(
+    os.getenv('CACHE_VERSION_TIMEOUT', default=5)
+)
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -180,3 +201,41 @@ DJOSER = {
 }
 
 CORS_URLS_REGEX = r'^/api/.*$'
+
+# Время в секундах, на которое сохраняются ответы выдачи рецептов
+# для неавторизованных пользователей
+RECIPES_CACHE_TIMEOUT = int(
+    os.getenv('RECIPES_CACHE_TIMEOUT', default=60 * 10)
+)
+
+# Приблизительный подсчет количества в пагинации: оценка PostgreSQL
+# для таблиц от PAGINATION_ESTIMATE_MIN строк без условий, иначе точное
+# количество из кэша на PAGINATION_COUNT_TIMEOUT секунд
+PAGINATION_APPROXIMATE_COUNT = (
+    os.getenv('PAGINATION_APPROXIMATE_COUNT', default='False') == 'True'
+)
+PAGINATION_ESTIMATE_MIN = 10000
+PAGINATION_COUNT_TIMEOUT = 60
+
+# Максимальный размер картинки рецепта в байтах. Картинка передается
+# в base64 внутри JSON, поэтому лимит тела запроса больше на треть
+RECIPE_IMAGE_MAX_SIZE = 5 * 1024 * 1024
+# Максимальное число пикселей картинки рецепта. Сжатая картинка
+# в пределах RECIPE_IMAGE_MAX_SIZE может распаковаться в сотни
+# мегапикселей, поэтому размер в пикселях ограничен отдельно
+RECIPE_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+DATA_UPLOAD_MAX_MEMORY_SIZE = 8 * 1024 * 1024
+
+# Уменьшенные копии картинок рецептов создаются пулом потоков
+# из RECIPE_RENDITIONS_WORKERS потоков, при RECIPE_RENDITIONS_EAGER
+# сразу в потоке запроса
+RECIPE_RENDITIONS_WORKERS = 2
+RECIPE_RENDITIONS_EAGER = False
+
+# Время в секундах, на которое клиенты кэшируют теги и ингридиенты
+DICTIONARY_CACHE_MAX_AGE = 60
+
+# Поиск ингридиентов по индексу в памяти процесса вместо запроса к базе
+INGREDIENTS_SEARCH_INDEX = (
+    os.getenv('INGREDIENTS_SEARCH_INDEX', default='True') == 'True'
+)
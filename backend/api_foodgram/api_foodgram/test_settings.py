@@ -8,3 +8,5 @@ DATABASES = {
         'NAME': 'db.sqlite3',
     }
 }
+
+RECIPE_RENDITIONS_EAGER = True
@@ -1,11 +1,9 @@
 from django.contrib import admin
-from django.db.models import Count
 
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin
 
-from recipes.models import (FavoriteRecipes,
-                            IngredientInRecipe,
+from recipes.models import (IngredientInRecipe,
                             Ingredients,
                             Recipes,
                             Tags)
@@ -54,7 +52,14 @@ class IngredientInRecipeInline(admin.TabularInline):
 
 @admin.register(Recipes)
 class RecipesAdmin(admin.ModelAdmin):
-    """Класс, формирующий админ-панель сайта, раздел: Рецепты."""
+    """
+    Класс, формирующий админ-панель сайта, раздел: Рецепты.
+
+    Количество добавлений в избранное берется из счетчика рецепта,
+    авторы подгружаются вместе с рецептами, а фильтры по автору и тегу
+    фильтруют по id, поэтому страница списка строится фиксированным
+    числом запросов.
+    """
     list_display = (
         'author',
         'name',
@@ -62,20 +67,18 @@ class RecipesAdmin(admin.ModelAdmin):
         'cooking_time',
         'is_favorite'
     )
+    list_select_related = ('author',)
     inlines = (IngredientInRecipeInline,)
     filter_horizontal = ('tags',)
+    search_fields = ('name',)
     list_filter = [
-        'name',
-        'author__username',
-        'tags__name',
+        ('author', admin.RelatedOnlyFieldListFilter),
+        ('tags', admin.RelatedFieldListFilter),
     ]
 
+    @admin.display(description='В избранном', ordering='favorites_count')
     def is_favorite(self, obj):
-        result = (
-            FavoriteRecipes.objects.
-            filter(recipe=obj).
-            aggregate(is_favorite=Count('recipe')))
-        return result["is_favorite"]
+        return obj.favorites_count
 
 
 @admin.register(IngredientInRecipe)
@@ -0,0 +1,69 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import FavoriteRecipes, Recipes
+
+from users.models import Subscriptions, User
+
+
+def change_counter(model, pk, field, delta):
+    """
+    Изменяет счетчик одним запросом UPDATE в текущей транзакции.
+    Значение не опускается ниже нуля.
+
+    Параметры
+    ---------
+    model: Model
+        модель со счетчиком
+    pk: int
+        id обьекта
+    field: str
+        поле счетчика
+    delta: int
+        изменение счетчика
+    """
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def count_related(model, field):
+    """
+    Возвращает выражение подзапроса с количеством строк model,
+    ссылающихся на обьект через field.
+
+    Параметры
+    ---------
+    model: Model
+        модель связанных обьектов
+    field: str
+        поле внешнего ключа
+
+    Возвращаемое значение
+    ---------------------
+    Coalesce
+    """
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')}).
+            order_by().values(field).
+            annotate(total=Count('pk')).values('total')
+        ),
+        0
+    )
+
+
+@transaction.atomic
+def recompute_counters():
+    """
+    Пересчитывает счетчики рецептов, подписчиков и избранного
+    по данным связанных таблиц.
+    """
+    User.objects.update(
+        recipes_count=count_related(Recipes, 'author'),
+        followers_count=count_related(Subscriptions, 'author'),
+    )
+    Recipes.objects.update(
+        favorites_count=count_related(FavoriteRecipes, 'recipe'),
+    )
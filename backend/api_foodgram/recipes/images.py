@@ -0,0 +1,247 @@
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+from django.conf import settings
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.dispatch import Signal
+
+from recipes.storage import lock_image, recipe_image_storage
+
+logger = logging.getLogger(__name__)
+
+renditions_ready = Signal()
+
+THUMBNAIL = 'thumbnail'
+MEDIUM = 'medium'
+RENDITIONS = {
+    THUMBNAIL: (320, 320),
+    MEDIUM: (960, 960),
+}
+RENDITIONS_DIR = 'renditions'
+RENDITION_FORMAT = 'WEBP'
+RENDITION_EXTENSION = 'webp'
+RENDITION_QUALITY = 80
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.RECIPE_RENDITIONS_WORKERS,
+    thread_name_prefix='renditions'
+)
+
+
+def get_rendition_name(image_name, rendition):
+    """
+    Возвращает путь уменьшенной копии картинки в хранилище.
+
+    Параметры
+    ---------
+    image_name: str
+        путь исходной картинки
+    rendition: str
+        название копии
+
+    Возвращаемое значение
+    ---------------------
+    str
+    """
+    directory, filename = os.path.split(image_name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(
+        directory, RENDITIONS_DIR,
+        f'{stem}_{rendition}.{RENDITION_EXTENSION}'
+    )
+
+
+def render(image, size):
+    """
+    Возвращает уменьшенную до size копию картинки в формате WebP.
+
+    Параметры
+    ---------
+    image: Image
+        исходная картинка
+    size: tuple[int, int]
+        максимальные ширина и высота
+
+    Возвращаемое значение
+    ---------------------
+    bytes
+    """
+    copy = image.copy()
+    copy.thumbnail(size, Image.LANCZOS)
+    if copy.mode not in ('RGB', 'RGBA'):
+        copy = copy.convert('RGBA' if 'A' in copy.getbands() else 'RGB')
+    output = BytesIO()
+    copy.save(output, RENDITION_FORMAT, quality=RENDITION_QUALITY)
+    return output.getvalue()
+
+
+def render_renditions(image_name):
+    """
+    Создает уменьшенные копии картинки во временных файлах.
+
+    Параметры
+    ---------
+    image_name: str
+        путь картинки в хранилище
+
+    Возвращаемое значение
+    ---------------------
+    dict[str, File]
+        временные файлы копий по их названиям
+    """
+    with recipe_image_storage.open(image_name) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    files = {}
+    for rendition, size in RENDITIONS.items():
+        buffer = tempfile.TemporaryFile()
+        buffer.write(render(image, size))
+        buffer.seek(0)
+        files[rendition] = File(buffer)
+    return files
+
+
+def save_renditions(names, files):
+    """
+    Переносит уменьшенные копии картинки в хранилище, заменяя
+    существующие.
+
+    Параметры
+    ---------
+    names: dict[str, str]
+        пути копий по их названиям
+    files: dict[str, File]
+        временные файлы копий по их названиям
+    """
+    for rendition, name in names.items():
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        default_storage.save(name, files[rendition])
+
+
+def make_renditions(recipe_id, image_name):
+    """
+    Создает уменьшенные копии картинки рецепта и отмечает их готовность,
+    если картинка рецепта за это время не сменилась. О готовности
+    сообщает сигнал renditions_ready. Имена картинок зависят только
+    от содержимого, поэтому уже созданные для такой же картинки копии
+    используются повторно. Копии рисуются во временные файлы без
+    блокировок, а в хранилище переносятся под блокировкой файла
+    картинки, чтобы не появиться заново после удаления картинки. Если
+    копии удалили, пока они рисовались, картинка обрабатывается заново.
+
+    Параметры
+    ---------
+    recipe_id: int
+        id рецепта
+    image_name: str
+        путь картинки в хранилище
+    """
+    from recipes.models import Recipes
+    names = {
+        rendition: get_rendition_name(image_name, rendition)
+        for rendition in RENDITIONS
+    }
+    files = {}
+    stale = False
+    try:
+        if not all(map(default_storage.exists, names.values())):
+            files = render_renditions(image_name)
+        with transaction.atomic():
+            lock_image(image_name)
+            if not recipe_image_storage.exists(image_name):
+                logger.warning('Картинка %s не найдена', image_name)
+                return
+            if files:
+                save_renditions(names, files)
+            else:
+                stale = not all(map(default_storage.exists, names.values()))
+            updated = not stale and Recipes.objects.filter(
+                pk=recipe_id, image=image_name
+            ).update(renditions_source=image_name)
+            if updated:
+                renditions_ready.send(sender=Recipes, recipe_id=recipe_id)
+    except FileNotFoundError:
+        logger.warning('Картинка %s не найдена', image_name)
+    except Exception:
+        logger.exception('Не удалось обработать картинку %s', image_name)
+    finally:
+        for file in files.values():
+            file.close()
+    if stale:
+        make_renditions(recipe_id, image_name)
+
+
+def run_in_worker(recipe_id, image_name):
+    """
+    Создает уменьшенные копии в потоке пула и закрывает соединение
+    с базой данных, открытое этим потоком.
+
+    Параметры
+    ---------
+    recipe_id: int
+        id рецепта
+    image_name: str
+        путь картинки в хранилище
+    """
+    try:
+        make_renditions(recipe_id, image_name)
+    finally:
+        connection.close()
+
+
+def schedule_renditions(recipe_id, image_name):
+    """
+    Ставит создание уменьшенных копий в очередь пула потоков.
+    При включенной настройке RECIPE_RENDITIONS_EAGER копии создаются
+    сразу в текущем потоке.
+
+    Параметры
+    ---------
+    recipe_id: int
+        id рецепта
+    image_name: str
+        путь картинки в хранилище
+    """
+    if settings.RECIPE_RENDITIONS_EAGER:
+        make_renditions(recipe_id, image_name)
+    else:
+        executor.submit(run_in_worker, recipe_id, image_name)
+
+
+def delete_unused_images(image_names):
+    """
+    Удаляет картинки, на которые больше не ссылается ни один рецепт,
+    вместе с их уменьшенными копиями. Одинаковые картинки хранятся
+    одним файлом, поэтому число ссылок на файл равно числу рецептов
+    с этой картинкой. Ссылки считаются под блокировкой lock_image,
+    поэтому рецепт, который в это время сохраняется с такой же
+    картинкой, либо учитывается, либо записывает файл заново.
+
+    Параметры
+    ---------
+    image_names: Iterable[str]
+        пути картинок в хранилище
+    """
+    from recipes.models import Recipes, StoredImage
+    for image_name in {name for name in image_names if name}:
+        try:
+            with transaction.atomic():
+                lock_image(image_name)
+                if Recipes.objects.filter(image=image_name).exists():
+                    continue
+                StoredImage.objects.filter(name=image_name).delete()
+                recipe_image_storage.delete(image_name)
+                for rendition in RENDITIONS:
+                    default_storage.delete(
+                        get_rendition_name(image_name, rendition)
+                    )
+        except Exception:
+            logger.exception('Не удалось удалить картинку %s', image_name)
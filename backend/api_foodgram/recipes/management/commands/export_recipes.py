@@ -0,0 +1,107 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+
+from recipes.models import IngredientInRecipe, Recipes
+
+BATCH_SIZE = 500
+
+
+def serialize_recipe(recipe):
+    """
+    Возвращает запись рецепта в формате import_recipes.
+
+    Параметры
+    ---------
+    recipe: Recipes
+        рецепт с подгруженными автором, тегами и ингридиентами
+
+    Возвращаемое значение
+    ---------------------
+    dict
+    """
+    return {
+        'author': recipe.author.username,
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'image': recipe.image.name,
+        'tags': [tag.slug for tag in recipe.tags.all()],
+        'ingredients': [
+            {
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in recipe.recipe_ingredients.all()
+        ],
+    }
+
+
+class Command(BaseCommand):
+    """
+    Команда экспорта рецептов в NDJSON, по одному рецепту в строке.
+    Рецепты читаются пачками по id, связанные данные каждой пачки
+    подгружаются фиксированным числом запросов.
+    """
+    help = 'Экспортирует рецепты в NDJSON файл'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='путь к NDJSON файлу, - для вывода в stdout'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='количество рецептов в одном запросе'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше 0')
+        path = options['path']
+        try:
+            file = (
+                sys.stdout if path == '-'
+                else open(path, 'w', encoding='utf-8')
+            )
+        except OSError as exc:
+            raise CommandError(f'Не удалось открыть {path}: {exc}')
+        queryset = Recipes.objects.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        ).order_by('id')
+        started = time.monotonic()
+        exported = 0
+        last_id = 0
+        try:
+            while True:
+                batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+                if not batch:
+                    break
+                for recipe in batch:
+                    file.write(json.dumps(
+                        serialize_recipe(recipe), ensure_ascii=False
+                    ))
+                    file.write('\n')
+                exported += len(batch)
+                last_id = batch[-1].id
+                elapsed = time.monotonic() - started
+                self.stderr.write(
+                    f'Выгружено {exported} рецептов за {elapsed:.2f} с '
+                    f'({exported / max(elapsed, 1e-6):.0f} строк/с)'
+                )
+        finally:
+            if file is not sys.stdout:
+                file.close()
+        self.stderr.write(self.style.SUCCESS(
+            f'Экспорт завершен: {exported} рецептов'
+        ))
@@ -0,0 +1,353 @@
+import json
+import sys
+import time
+from collections import Counter
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from import_export.signals import post_import
+
+from recipes.counters import change_counter
+from recipes.models import IngredientInRecipe, Ingredients, Recipes, Tags
+
+from users.models import User
+
+BATCH_SIZE = 500
+MAX_NAME_LENGTH = 200
+MAX_TEXT_LENGTH = 1500
+MIN_COOKING_TIME = 1
+MAX_COOKING_TIME = 100
+MIN_AMOUNT = 1
+MAX_AMOUNT = 32767
+
+
+class RecordError(Exception):
+    """Ошибка в строке файла импорта."""
+
+
+def get_int(record, key, min_value, max_value):
+    """
+    Возвращает целое значение поля записи в заданных границах.
+    Логические значения не считаются целыми.
+
+    Параметры
+    ---------
+    record: dict
+        запись
+    key: str
+        поле
+    min_value: int
+    max_value: int
+
+    Возвращаемое значение
+    ---------------------
+    int
+    """
+    value = record.get(key)
+    if (
+        not isinstance(value, int) or isinstance(value, bool)
+        or not min_value <= value <= max_value
+    ):
+        raise RecordError(
+            f'{key} должно быть целым числом от {min_value} до {max_value}'
+        )
+    return value
+
+
+def get_str(record, key, max_length):
+    """
+    Возвращает непустое строковое значение поля записи.
+
+    Параметры
+    ---------
+    record: dict
+        запись
+    key: str
+        поле
+    max_length: int | None
+        максимальная длина
+
+    Возвращаемое значение
+    ---------------------
+    str
+    """
+    value = record.get(key)
+    if not isinstance(value, str) or not value:
+        raise RecordError(f'не указано {key}')
+    if max_length is not None and len(value) > max_length:
+        raise RecordError(f'{key} длиннее {max_length} символов')
+    return value
+
+
+class Command(BaseCommand):
+    """
+    Команда импорта рецептов из NDJSON.
+
+    Каждая строка файла содержит обьект рецепта:
+    {"author": "логин", "name": "...", "text": "...", "cooking_time": 10,
+    "image": "путь в хранилище", "tags": ["slug"], "ingredients":
+    [{"name": "...", "measurement_unit": "...", "amount": 1}]}
+
+    Авторы, теги и ингридиенты сопоставляются с id по словарям,
+    загруженным один раз. Рецепты, связи с тегами и ингридиентами
+    записываются bulk_create пачками по --batch-size рецептов, каждая
+    пачка в своей транзакции. Рецепты, уже существующие у автора,
+    пропускаются.
+    """
+    help = 'Импортирует рецепты из NDJSON файла'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='путь к NDJSON файлу, - для чтения из stdin'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='количество рецептов в одной транзакции'
+        )
+
+    def load_maps(self):
+        """Загружает словари авторов, тегов и ингридиентов."""
+        self.authors = dict(User.objects.values_list('username', 'id'))
+        self.tags = dict(Tags.objects.values_list('slug', 'id'))
+        self.ingredients = {
+            (name, measurement_unit): pk
+            for pk, name, measurement_unit in Ingredients.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        }
+
+    def parse_tags(self, record):
+        """
+        Сопоставляет slug тегов записи с id.
+
+        Параметры
+        ---------
+        record: dict
+            запись рецепта
+
+        Возвращаемое значение
+        ---------------------
+        set[int]
+        """
+        tags = record.get('tags') or []
+        if not isinstance(tags, list):
+            raise RecordError('tags должно быть списком')
+        tag_ids = set()
+        for slug in tags:
+            if not isinstance(slug, str) or slug not in self.tags:
+                raise RecordError(f'неизвестный тег {slug}')
+            tag_ids.add(self.tags[slug])
+        return tag_ids
+
+    def parse_ingredients(self, record):
+        """
+        Сопоставляет ингридиенты записи с id.
+
+        Параметры
+        ---------
+        record: dict
+            запись рецепта
+
+        Возвращаемое значение
+        ---------------------
+        dict[int, int]
+            количество по id ингридиента
+        """
+        ingredients = record.get('ingredients') or []
+        if not isinstance(ingredients, list):
+            raise RecordError('ingredients должно быть списком')
+        amounts = {}
+        for item in ingredients:
+            if not isinstance(item, dict):
+                raise RecordError('ингридиент должен быть обьектом')
+            key = (item.get('name'), item.get('measurement_unit'))
+            if (
+                not all(isinstance(value, str) for value in key)
+                or key not in self.ingredients
+            ):
+                raise RecordError(f'неизвестный ингридиент {key[0]}')
+            if self.ingredients[key] in amounts:
+                raise RecordError(f'ингридиент {key[0]} указан дважды')
+            amounts[self.ingredients[key]] = get_int(
+                item, 'amount', MIN_AMOUNT, MAX_AMOUNT
+            )
+        return amounts
+
+    def parse_record(self, record):
+        """
+        Проверяет запись и сопоставляет названия с id.
+
+        Параметры
+        ---------
+        record: dict
+            запись рецепта
+
+        Возвращаемое значение
+        ---------------------
+        tuple[Recipes, set[int], dict[int, int]]
+            рецепт, id тегов и количество по id ингридиентов
+        """
+        if not isinstance(record, dict):
+            raise RecordError('ожидается обьект')
+        author = record.get('author')
+        if not isinstance(author, str) or author not in self.authors:
+            raise RecordError(f'неизвестный автор {author}')
+        author_id = self.authors[author]
+        recipe = Recipes(
+            author_id=author_id,
+            name=get_str(record, 'name', MAX_NAME_LENGTH),
+            text=get_str(record, 'text', MAX_TEXT_LENGTH),
+            image=get_str(record, 'image', None),
+            cooking_time=get_int(
+                record, 'cooking_time', MIN_COOKING_TIME, MAX_COOKING_TIME
+            ),
+        )
+        tag_ids = self.parse_tags(record)
+        amounts = self.parse_ingredients(record)
+        if not tag_ids or not amounts:
+            raise RecordError('нужны хотя бы один тег и один ингридиент')
+        return recipe, tag_ids, amounts
+
+    def read_records(self, file):
+        """
+        Читает и разбирает записи файла, ошибки выводит в stderr.
+
+        Параметры
+        ---------
+        file: file
+            открытый NDJSON файл
+
+        Возвращаемое значение
+        ---------------------
+        Iterator[tuple[Recipes, set[int], dict[int, int]] | None]
+            разобранная запись или None для записи с ошибкой
+        """
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield self.parse_record(json.loads(line))
+            except (ValueError, RecordError) as exc:
+                self.stderr.write(f'Строка {line_number}: {exc}')
+                yield None
+
+    @transaction.atomic
+    def import_batch(self, entries):
+        """
+        Записывает пачку рецептов с тегами и ингридиентами.
+
+        Параметры
+        ---------
+        entries: list[tuple[Recipes, set[int], dict[int, int]]]
+            разобранные записи
+
+        Возвращаемое значение
+        ---------------------
+        int
+            количество добавленных рецептов
+        """
+        keys = {
+            (recipe.author_id, recipe.name) for recipe, _, _ in entries
+        }
+        existing = set(
+            Recipes.objects.filter(
+                author_id__in={author_id for author_id, _ in keys},
+                name__in={name for _, name in keys},
+            ).values_list('author_id', 'name')
+        )
+        new_entries = []
+        for entry in entries:
+            key = (entry[0].author_id, entry[0].name)
+            if key not in existing:
+                existing.add(key)
+                new_entries.append(entry)
+        if not new_entries:
+            return 0
+        recipes = Recipes.objects.bulk_create(
+            [recipe for recipe, _, _ in new_entries]
+        )
+        if any(recipe.pk is None for recipe in recipes):
+            ids = {
+                (author_id, name): pk
+                for pk, author_id, name in Recipes.objects.filter(
+                    author_id__in={recipe.author_id for recipe in recipes},
+                    name__in={recipe.name for recipe in recipes},
+                ).values_list('id', 'author_id', 'name')
+            }
+            for recipe in recipes:
+                recipe.pk = ids[(recipe.author_id, recipe.name)]
+        Recipes.tags.through.objects.bulk_create([
+            Recipes.tags.through(recipes_id=recipe.pk, tags_id=tag_id)
+            for recipe, tag_ids, _ in new_entries
+            for tag_id in tag_ids
+        ])
+        IngredientInRecipe.objects.bulk_create([
+            IngredientInRecipe(
+                recipe_id=recipe.pk, ingredient_id=ingredient_id,
+                amount=amount
+            )
+            for recipe, _, amounts in new_entries
+            for ingredient_id, amount in amounts.items()
+        ])
+        authors = Counter(recipe.author_id for recipe in recipes)
+        for author_id, count in authors.items():
+            change_counter(User, author_id, 'recipes_count', count)
+        return len(recipes)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше 0')
+        path = options['path']
+        try:
+            file = (
+                nullcontext(sys.stdin) if path == '-'
+                else open(path, encoding='utf-8')
+            )
+        except OSError as exc:
+            raise CommandError(f'Не удалось открыть {path}: {exc}')
+        self.load_maps()
+        started = time.monotonic()
+        read = created = errors = 0
+        entries = []
+        with file as lines:
+            for entry in self.read_records(lines):
+                read += 1
+                if entry is None:
+                    errors += 1
+                    continue
+                entries.append(entry)
+                if len(entries) >= batch_size:
+                    created += self.import_batch(entries)
+                    entries = []
+                    self.report(read, created, started)
+            if entries:
+                created += self.import_batch(entries)
+        if created:
+            post_import.send(sender=None, model=Recipes)
+        self.report(read, created, started)
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт завершен: добавлено {created}, '
+            f'пропущено {read - created - errors}, ошибок {errors}'
+        ))
+
+    def report(self, read, created, started):
+        """
+        Выводит прогресс импорта.
+
+        Параметры
+        ---------
+        read: int
+            прочитано записей
+        created: int
+            добавлено рецептов
+        started: float
+            время начала импорта
+        """
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Прочитано {read}, добавлено {created} рецептов '
+            f'за {elapsed:.2f} с ({read / max(elapsed, 1e-6):.0f} строк/с)'
+        )
@@ -0,0 +1,194 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from import_export.signals import post_import
+
+from recipes.models import Ingredients
+
+BATCH_SIZE = 1000
+READ_SIZE = 64 * 1024
+FORMATS = ('csv', 'json')
+
+
+def read_csv(file):
+    """
+    Читает ингридиенты из CSV со столбцами название и единица
+    измерения.
+
+    Параметры
+    ---------
+    file: file
+        открытый текстовый файл
+
+    Возвращаемое значение
+    ---------------------
+    Iterator[tuple[str, str]]
+    """
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def get_item_values(item, index):
+    """
+    Возвращает название и единицу измерения из элемента JSON массива,
+    проверяя их типы.
+
+    Параметры
+    ---------
+    item: Any
+        элемент массива
+    index: int
+        номер элемента в массиве
+
+    Возвращаемое значение
+    ---------------------
+    tuple[str, str]
+    """
+    if not isinstance(item, dict):
+        raise CommandError(
+            f'Элемент {index} массива должен быть обьектом, '
+            f'получено: {item!r}'
+        )
+    values = item.get('name', ''), item.get('measurement_unit', '')
+    for key, value in zip(('name', 'measurement_unit'), values):
+        if not isinstance(value, str):
+            raise CommandError(
+                f'Элемент {index} массива: {key} должен быть строкой, '
+                f'получено: {value!r}'
+            )
+    return values
+
+
+def read_json(file, read_size=READ_SIZE):
+    """
+    Читает ингридиенты из JSON массива обьектов с ключами name и
+    measurement_unit. Файл разбирается частями по read_size символов,
+    поэтому целиком в памяти не держится. Элемент другого типа или
+    значение не строкой прерывают загрузку с номером элемента.
+
+    Параметры
+    ---------
+    file: file
+        открытый текстовый файл
+    read_size: int
+        размер читаемой части файла
+
+    Возвращаемое значение
+    ---------------------
+    Iterator[tuple[str, str]]
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(read_size).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('JSON должен содержать массив обьектов')
+    buffer = buffer[1:]
+    finished = False
+    index = 0
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,')
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if finished:
+                raise CommandError('Некорректный JSON')
+            chunk = file.read(read_size)
+            finished = not chunk
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        yield get_item_values(item, index)
+        index += 1
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
+
+class Command(BaseCommand):
+    """
+    Команда загрузки справочника ингридиентов из CSV или JSON.
+
+    Файл читается потоком, повторы внутри файла отбрасываются,
+    а существующие в базе ингридиенты пропускаются ограничением
+    unique_name. Ингридиенты вставляются пачками bulk_create в одной
+    транзакции, после чего меняется версия справочника.
+    """
+    help = 'Загружает ингридиенты из CSV или JSON файла'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='путь к файлу с ингридиентами')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='формат файла, по умолчанию определяется по расширению'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='количество ингридиентов в одном INSERT'
+        )
+
+    def get_rows(self, rows):
+        """
+        Отбрасывает пустые строки и повторы внутри файла.
+
+        Параметры
+        ---------
+        rows: Iterable[tuple[str, str]]
+            название и единица измерения, уже проверенные читателем
+
+        Возвращаемое значение
+        ---------------------
+        Iterator[Ingredients]
+        """
+        seen = set()
+        for name, measurement_unit in rows:
+            key = (name.strip(), measurement_unit.strip())
+            if not all(key) or key in seen:
+                continue
+            seen.add(key)
+            yield Ingredients(name=key[0], measurement_unit=key[1])
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format']
+        if file_format is None:
+            file_format = os.path.splitext(path)[1].lstrip('.').lower()
+        if file_format not in READERS:
+            raise CommandError(
+                f'Формат {file_format} не поддерживается, '
+                f'укажите --format из {", ".join(FORMATS)}'
+            )
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше 0')
+        started = time.monotonic()
+        total = 0
+        try:
+            file = open(path, encoding='utf-8', newline='')
+        except OSError as exc:
+            raise CommandError(f'Не удалось открыть {path}: {exc}')
+        with file, transaction.atomic():
+            before = Ingredients.objects.count()
+            ingredients = self.get_rows(READERS[file_format](file))
+            while True:
+                batch = list(islice(ingredients, options['batch_size']))
+                if not batch:
+                    break
+                Ingredients.objects.bulk_create(batch, ignore_conflicts=True)
+                total += len(batch)
+            created = Ingredients.objects.count() - before
+            post_import.send(sender=None, model=Ingredients)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано {total}, добавлено {created} ингридиентов '
+            f'за {elapsed:.2f} с ({total / max(elapsed, 1e-6):.0f} строк/с)'
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from recipes.images import make_renditions
+from recipes.models import Recipes
+
+
+class Command(BaseCommand):
+    """
+    Команда создания уменьшенных копий картинок рецептов, для которых
+    копии не готовы. Задачи пула потоков теряются при перезапуске
+    сервера, поэтому команду стоит запускать после развертывания.
+    """
+    help = 'Создает недостающие уменьшенные копии картинок рецептов'
+
+    def handle(self, *args, **options):
+        recipes = Recipes.objects.exclude(image='').exclude(
+            renditions_source=F('image')
+        ).values_list('id', 'image')
+        count = 0
+        for recipe_id, image_name in recipes.iterator():
+            make_renditions(recipe_id, image_name)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок рецептов: {count}'
+        ))
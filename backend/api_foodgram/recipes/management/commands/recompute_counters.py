@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import recompute_counters
+
+
+class Command(BaseCommand):
+    """
+    Команда пересчета счетчиков рецептов, подписчиков и избранного.
+    Нужна после массовых операций, которые не вызывают сигналы
+    моделей, например bulk_create или загрузки дампа.
+    """
+    help = 'Пересчитывает счетчики рецептов, подписчиков и избранного'
+
+    def handle(self, *args, **options):
+        recompute_counters()
+        self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны'))
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+INDEX_NAME = 'recipes_ingredients_name_upper_idx'
+
+CREATE_INDEX = {
+    'postgresql': (
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} '
+        'ON recipes_ingredients (UPPER(name) text_pattern_ops)'
+    ),
+    'sqlite': (
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} '
+        'ON recipes_ingredients (UPPER(name))'
+    ),
+}
+
+
+def create_index(apps, schema_editor):
+    sql = CREATE_INDEX.get(schema_editor.connection.vendor)
+    if sql is not None:
+        schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_INDEX:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_alter_ingredients_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
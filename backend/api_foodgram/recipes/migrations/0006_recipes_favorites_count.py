@@ -0,0 +1,34 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_favorites_count(apps, schema_editor):
+    Recipes = apps.get_model('recipes', 'Recipes')
+    FavoriteRecipes = apps.get_model('recipes', 'FavoriteRecipes')
+    Recipes.objects.update(
+        favorites_count=Coalesce(
+            Subquery(
+                FavoriteRecipes.objects.filter(recipe=OuterRef('pk')).
+                order_by().values('recipe').
+                annotate(total=Count('pk')).values('total')
+            ),
+            0
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_ingredients_name_upper_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipes',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество добавлений в избранное'),
+        ),
+        migrations.RunPython(fill_favorites_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipes_favorites_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipes',
+            name='renditions_source',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Картинка уменьшенных копий'),
+        ),
+    ]
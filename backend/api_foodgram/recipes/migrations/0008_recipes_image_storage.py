@@ -0,0 +1,17 @@
+from django.db import migrations, models
+import recipes.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipes_renditions_source'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipes',
+            name='image',
+            field=models.ImageField(db_index=True, storage=recipes.storage.ContentAddressedStorage(), upload_to='api_foodgram/images/', verbose_name='Ссылка на картинку на сайте'),
+        ),
+    ]
@@ -2,9 +2,12 @@ from colorfield.fields import ColorField
 
 from django.core.validators import (MaxLengthValidator, MaxValueValidator,
                                     MinValueValidator)
-from django.db import models
+from django.db import models, transaction
 from django.db.models import UniqueConstraint
 
+from recipes.storage import recipe_image_storage
+
+from users.mixins import CountersMixin
 from users.models import User
 
 
@@ -89,7 +92,7 @@ class Tags(models.Model):
         return self.slug
 
 
-class Recipes(models.Model):
+class Recipes(CountersMixin, models.Model):
     """
     Модель Рецептов.
 
@@ -113,6 +116,19 @@ class Recipes(models.Model):
         Дата публикации
     ingredients: int
         Ингридиента в рецепте
+    favorites_count: int
+        Количество добавлений в избранное
+    renditions_source: str
+        Картинка, для которой созданы уменьшенные копии
+
+    Методы
+    ------
+    has_renditions():
+        Проверяет, что уменьшенные копии текущей картинки готовы.
+    get_replaced_image():
+        Возвращает путь картинки, замененной после загрузки из базы.
+    save(*args, **kwargs):
+        Сохраняет рецепт в одной транзакции с записью картинки.
     """
     author = models.ForeignKey(
         User,
@@ -141,7 +157,9 @@ class Recipes(models.Model):
     )
     image = models.ImageField(
         verbose_name='Ссылка на картинку на сайте',
-        upload_to='api_foodgram/images/'
+        upload_to='api_foodgram/images/',
+        storage=recipe_image_storage,
+        db_index=True,
     )
     tags = models.ManyToManyField(
         Tags,
@@ -159,6 +177,19 @@ class Recipes(models.Model):
         verbose_name='Ингридиента в рецепте',
         through='IngredientInRecipe',
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Количество добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    renditions_source = models.CharField(
+        verbose_name='Картинка уменьшенных копий',
+        max_length=100,
+        blank=True,
+        editable=False,
+    )
+
+    counter_fields = ('favorites_count',)
 
     class Meta:
         verbose_name = 'Рецепт'
@@ -174,6 +205,38 @@ class Recipes(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'image' in field_names:
+            instance._loaded_image = values[field_names.index('image')]
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет рецепт в одной транзакции с записью картинки, чтобы
+        блокировка файла картинки держалась до появления ссылки на него.
+        """
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def has_renditions(self):
+        return bool(self.image) and self.renditions_source == self.image.name
+
+    def get_replaced_image(self):
+        """
+        Возвращает путь картинки, которая была у рецепта при загрузке
+        из базы и с тех пор заменена, иначе пустую строку.
+
+        Возвращаемое значение
+        ---------------------
+        str
+        """
+        loaded = getattr(self, '_loaded_image', '')
+        if loaded is models.DEFERRED or loaded == self.image.name:
+            return ''
+        return loaded or ''
+
 
 class IngredientInRecipe(models.Model):
     """
@@ -287,3 +350,33 @@ class ShoppingCart(UserRecipeAbstractModel):
                 name='unique_shopping_cart'
             ),
         ]
+
+
+class StoredImage(models.Model):
+    """
+    Модель файла картинки рецепта в хранилище.
+
+    Запись блокируется SELECT FOR UPDATE при записи файла и при его
+    удалении, поэтому загрузка такой же картинки и удаление файла без
+    ссылок не выполняются одновременно. Количество ссылок на файл
+    равно числу рецептов с этой картинкой.
+
+    ...
+
+    Атрибуты
+    --------
+    name: str
+        Путь картинки в хранилище
+    """
+    name = models.CharField(
+        max_length=100,
+        primary_key=True,
+        verbose_name='Путь картинки в хранилище'
+    )
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,83 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.counters import change_counter
+from recipes.images import delete_unused_images, schedule_renditions
+from recipes.models import FavoriteRecipes, Recipes
+
+from users.models import Subscriptions, User
+
+
+@receiver(post_save, sender=Recipes)
+def recipe_created(sender, instance, created, **kwargs):
+    """Увеличивает счетчик рецептов автора."""
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_save, sender=Recipes)
+def recipe_image_saved(sender, instance, **kwargs):
+    """
+    Ставит в очередь создание уменьшенных копий новой картинки
+    рецепта после фиксации транзакции.
+    """
+    if instance.image and not instance.has_renditions():
+        recipe_id, image_name = instance.pk, instance.image.name
+        transaction.on_commit(
+            lambda: schedule_renditions(recipe_id, image_name)
+        )
+
+
+@receiver(post_save, sender=Recipes)
+def recipe_image_replaced(sender, instance, **kwargs):
+    """
+    Удаляет после фиксации транзакции замененную картинку рецепта,
+    если на нее больше нет ссылок.
+    """
+    replaced = instance.get_replaced_image()
+    instance._loaded_image = instance.image.name
+    if replaced:
+        transaction.on_commit(lambda: delete_unused_images([replaced]))
+
+
+@receiver(post_delete, sender=Recipes)
+def recipe_image_released(sender, instance, **kwargs):
+    """
+    Удаляет после фиксации транзакции картинку удаленного рецепта,
+    если на нее больше нет ссылок.
+    """
+    image_name = instance.image.name
+    transaction.on_commit(lambda: delete_unused_images([image_name]))
+
+
+@receiver(post_delete, sender=Recipes)
+def recipe_deleted(sender, instance, **kwargs):
+    """Уменьшает счетчик рецептов автора."""
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Subscriptions)
+def subscription_created(sender, instance, created, **kwargs):
+    """Увеличивает счетчик подписчиков автора."""
+    if created:
+        change_counter(User, instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Subscriptions)
+def subscription_deleted(sender, instance, **kwargs):
+    """Уменьшает счетчик подписчиков автора."""
+    change_counter(User, instance.author_id, 'followers_count', -1)
+
+
+@receiver(post_save, sender=FavoriteRecipes)
+def favorite_created(sender, instance, created, **kwargs):
+    """Увеличивает счетчик добавлений рецепта в избранное."""
+    if created:
+        change_counter(Recipes, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=FavoriteRecipes)
+def favorite_deleted(sender, instance, **kwargs):
+    """Уменьшает счетчик добавлений рецепта в избранное."""
+    change_counter(Recipes, instance.recipe_id, 'favorites_count', -1)
@@ -0,0 +1,85 @@
+import hashlib
+import os
+
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+HASH_CHUNK = 64 * 1024
+
+
+def lock_image(name):
+    """
+    Блокирует запись файла картинки до конца текущей транзакции,
+    при отсутствии создает ее.
+
+    Параметры
+    ---------
+    name: str
+        путь картинки в хранилище
+    """
+    from recipes.models import StoredImage
+    StoredImage.objects.select_for_update().get_or_create(name=name)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файловое хранилище, называющее файлы по хэшу содержимого.
+
+    Имя файла складывается из каталога и расширения исходного имени
+    и sha256 содержимого, поэтому одинаковые картинки хранятся одним
+    файлом, а содержимое по ссылке никогда не меняется. Если файл
+    с таким содержимым уже есть, повторная запись пропускается.
+    Проверка и запись выполняются под блокировкой lock_image, которая
+    держится до фиксации транзакции, сохраняющей рецепт. Удалением
+    файлов, на которые больше нет ссылок, под той же блокировкой
+    занимается recipes.images.delete_unused_images.
+
+    ...
+
+    Методы
+    ------
+    get_content_name(name, content):
+        Возвращает имя файла по хэшу содержимого.
+    """
+
+    @staticmethod
+    def get_content_name(name, content):
+        """
+        Возвращает имя файла по хэшу содержимого.
+
+        Параметры
+        ---------
+        name: str
+            исходное имя файла с каталогом
+        content: File
+            содержимое файла
+
+        Возвращаемое значение
+        ---------------------
+        str
+        """
+        digest = hashlib.sha256()
+        for chunk in content.chunks(HASH_CHUNK):
+            digest.update(chunk)
+        content.seek(0)
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(directory, digest.hexdigest() + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_content_name(name, content)
+        with transaction.atomic():
+            lock_image(name)
+            if self.exists(name):
+                return name
+            return super().save(name, content, max_length)
+
+
+recipe_image_storage = ContentAddressedStorage()
@@ -0,0 +1,48 @@
+class CountersMixin:
+    """
+    Примесь для моделей с денормализованными счетчиками.
+
+    Счетчики меняются запросами UPDATE с F() выражениями, поэтому
+    обычное сохранение загруженного ранее обьекта не должно
+    записывать их старые значения. Если update_fields не переданы,
+    счетчики исключаются только из запроса UPDATE: обьект, строку
+    которого успели удалить, Django по-прежнему вставляет заново,
+    а отложенные поля, как и без примеси, не загружаются
+    и не записываются.
+
+    ...
+
+    Атрибуты
+    --------
+    counter_fields: tuple[str]
+        поля счетчиков
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        deferred_fields = self.get_deferred_fields()
+        if (
+            deferred_fields
+            and not self._state.adding
+            and not args
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+        ):
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred_fields
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields,
+                   forced_update):
+        if update_fields is None:
+            values = [
+                value for value in values
+                if value[0].name not in self.counter_fields
+            ]
+        return super()._do_update(
+            base_qs, using, pk_val, values, update_fields, forced_update
+        )
@@ -2,6 +2,8 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.db.models import UniqueConstraint
 
+from users.mixins import CountersMixin
+
 ADMIN = 'admin'
 USER = 'user'
 
@@ -11,7 +13,7 @@ LIST_OF_ROLES = [
 ]
 
 
-class User(AbstractUser):
+class User(CountersMixin, AbstractUser):
     """
     Модель для управления пользователями.
 
@@ -29,6 +31,15 @@ class User(AbstractUser):
         Фамилия
     permissions: str
         Роль
+    recipes_count: int
+        Количество рецептов пользователя
+    followers_count: int
+        Количество подписчиков пользователя
+
+    Методы
+    ------
+    pop_changed_fields(fields):
+        Возвращает поля, измененные после загрузки из базы.
     """
     email = models.EmailField(
         max_length=254,
@@ -62,6 +73,18 @@ class User(AbstractUser):
         choices=LIST_OF_ROLES,
         default=USER,
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False,
+    )
+
+    counter_fields = ('recipes_count', 'followers_count')
 
     @property
     def is_admin(self):
@@ -84,6 +107,41 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def pop_changed_fields(self, fields):
+        """
+        Возвращает поля из fields, значения которых изменились после
+        загрузки из базы, и запоминает текущие значения. Для обьекта,
+        не загруженного из базы, изменившимися считаются все поля.
+
+        Параметры
+        ---------
+        fields: Iterable[str]
+            названия полей
+
+        Возвращаемое значение
+        ---------------------
+        set[str]
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            loaded = self._loaded_values = {}
+        changed = set()
+        deferred = self.get_deferred_fields()
+        for field in fields:
+            if field in deferred:
+                continue
+            value = getattr(self, field)
+            if loaded.get(field, models.DEFERRED) != value:
+                changed.add(field)
+                loaded[field] = value
+        return changed
+
 
 class Subscriptions(models.Model):
     """
@@ -3,6 +3,14 @@ import tempfile
 import pytest
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+    cache.clear()
+    yield
+    cache.clear()
+
+
 @pytest.fixture()
 def mock_media(settings):
     with tempfile.TemporaryDirectory() as temp_directory:
@@ -287,4 +287,73 @@ class Test01UserAPI:
                 'Проверьте, что verbose_name в модели совпадает с ожидаемым'
             )
 
+    @pytest.mark.django_db(transaction=True)
+    def test_12_users_is_subscribed_query_count(self, user_client, user):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from users.models import Subscriptions
+        User = get_user_model()
+        for num in range(6):
+            author = User.objects.create_user(
+                username=f'TestAuthor{num}',
+                email=f'testauthor{num}@yamdb.fake',
+                password='123456789',
+            )
+            if num % 2:
+                Subscriptions.objects.create(author=author, user=user)
+
+        def count_queries(limit):
+            with CaptureQueriesContext(connection) as context:
+                response = user_client.get(f'/api/users/?limit={limit}')
+            assert response.status_code == 200
+            for result in response.json()['results']:
+                assert result['is_subscribed'] == Subscriptions.objects.filter(
+                    author=result['id'], user=user).exists(), (
+                    'Проверьте, что при GET запросе `/api/users/` '
+                    'поле is_subscribed заполнено верно'
+                )
+            return len(context.captured_queries)
+
+        assert count_queries(1) == count_queries(7), (
+            'Проверьте, что количество запросов при GET запросе `/api/users/` '
+            'не зависит от размера страницы'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_13_users_count_modes(self, client, user, user_test, admin, settings):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as context:
+            response = client.get('/api/users/?count=false&limit=2')
+        data = response.json()
+        assert response.status_code == 200 and data['count'] is None, (
+            'Проверьте, что при GET запросе `/api/users/?count=false` '
+            'общее количество не считается'
+        )
+        assert not any(
+            'COUNT(' in query['sql'].upper() for query in context.captured_queries
+        ), (
+            'Проверьте, что при `?count=false` не выполняется COUNT'
+        )
+        assert len(data['results']) == 2 and data['next'] and data['previous'] is None
+        data = client.get(data['next']).json()
+        assert len(data['results']) == 1 and data['next'] is None and data['previous'], (
+            'Проверьте, что при `?count=false` ссылки next и previous верны'
+        )
+        response = client.get('/api/users/?count=false&limit=2&page=3')
+        assert response.status_code == 404
 
+        settings.PAGINATION_APPROXIMATE_COUNT = True
+        assert client.get('/api/users/').json()['count'] == 3
+        get_user_model().objects.create_user(
+            username='TestUser3', email='testuser3@yamdb.fake', password='123456789'
+        )
+        with CaptureQueriesContext(connection) as context:
+            response = client.get('/api/users/')
+        assert response.json()['count'] == 3, (
+            'Проверьте, что при PAGINATION_APPROXIMATE_COUNT количество '
+            'берется из кэша'
+        )
+        assert not any(
+            'COUNT(' in query['sql'].upper() for query in context.captured_queries
+        )
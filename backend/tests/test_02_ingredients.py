@@ -108,3 +108,240 @@ class Test01IngredientsAPI:
             'Проверьте, что при GET запросе `/api/ingredients/?name=ingredients.name/` '
             'происходит поиск и данные фильтруются. '
         )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_08_search_ingredient_index(self, client, settings, ingredients, search_ingredients):
+        from recipes.models import Ingredients
+        for num in range(5):
+            Ingredients.objects.create(name=f'Search_{num}', measurement_unit='г')
+        settings.INGREDIENTS_SEARCH_INDEX = False
+        db_data = client.get('/api/ingredients/?name=sEARch').json()
+        settings.INGREDIENTS_SEARCH_INDEX = True
+        index_data = client.get('/api/ingredients/?name=sEARch').json()
+        assert len(index_data) == 6 and sorted(
+            index_data, key=lambda row: row['id']
+        ) == sorted(db_data, key=lambda row: row['id']), (
+            'Проверьте, что поиск по индексу в памяти совпадает с поиском по базе'
+        )
+        response = client.get('/api/ingredients/?name=search&limit=2')
+        assert len(response.json()) == 2, (
+            'Проверьте, что при GET запросе `/api/ingredients/?name=...&limit=2` '
+            'количество результатов ограничивается'
+        )
+        new_ingredient = Ingredients.objects.create(name='Search_new', measurement_unit='г')
+        data = client.get('/api/ingredients/?name=search_n').json()
+        assert [row['id'] for row in data] == [new_ingredient.id], (
+            'Проверьте, что индекс ингридиентов обновляется при изменении справочника'
+        )
+        new_ingredient.delete()
+        assert client.get('/api/ingredients/?name=search_n').json() == [], (
+            'Проверьте, что индекс ингридиентов обновляется при удалении ингридиента'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_09_ingredients_name_upper_index(self):
+        from django.db import connection
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, 'recipes_ingredients'
+            )
+        assert 'recipes_ingredients_name_upper_idx' in constraints, (
+            'Проверьте, что для поиска по названию ингридиента создан индекс'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_10_search_ingredient_uses_index(self, ingredients, search_ingredients):
+        from django.db import connection
+        from rest_framework.test import APIRequestFactory
+        from rest_framework.request import Request
+        from api.filters import IngredientsSearchFilter
+        from recipes.models import Ingredients
+        if connection.vendor != 'postgresql':
+            pytest.skip('План запроса с индексом проверяется только на PostgreSQL')
+        request = Request(APIRequestFactory().get('/api/ingredients/', {'name': 'sear'}))
+        queryset = IngredientsSearchFilter().filter_queryset(
+            request, Ingredients.objects.all(), None
+        )
+        assert list(queryset) == [search_ingredients]
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+        plan = queryset.explain()
+        assert 'recipes_ingredients_name_upper_idx' in plan, (
+            'Проверьте, что поиск ингридиента по названию использует индекс'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_11_fuzzy_search_ingredient(self, client):
+        from recipes.models import Ingredients
+        names = [
+            'вода',
+            'кокосовое молоко',
+            'малокалорийный йогурт',
+            'молоко',
+            'молоко сгущенное',
+            'сухое молоко',
+            'цельномолоковый продукт',
+        ]
+        for name in names:
+            Ingredients.objects.create(name=name, measurement_unit='г')
+        response = client.get('/api/ingredients/?name=молок&mode=fuzzy')
+        assert response.status_code == 200
+        assert [row['name'] for row in response.json()] == [
+            'молоко',
+            'молоко сгущенное',
+            'кокосовое молоко',
+            'сухое молоко',
+            'цельномолоковый продукт',
+            'малокалорийный йогурт',
+        ], (
+            'Проверьте, что при GET запросе `/api/ingredients/?name=...&mode=fuzzy` '
+            'сначала идут совпадения по началу названия, затем по началу слова, '
+            'затем по подстроке и затем совпадения с опечаткой'
+        )
+        response = client.get('/api/ingredients/?name=малоко&mode=fuzzy')
+        assert 'молоко' in [row['name'] for row in response.json()], (
+            'Проверьте, что нечеткий поиск находит ингридиенты с одной опечаткой'
+        )
+        response = client.get('/api/ingredients/?name=молок&mode=fuzzy&limit=2')
+        assert [row['name'] for row in response.json()] == [
+            'молоко', 'молоко сгущенное'
+        ], (
+            'Проверьте, что нечеткий поиск учитывает параметр limit'
+        )
+        response = client.get('/api/ingredients/?name=молок&mode=unknown')
+        assert response.status_code == 400
+
+    @pytest.mark.django_db(transaction=True)
+    def test_12_ingredients_http_cache(self, client, ingredients):
+        from api.models import CacheVersion
+        from django.core.cache import cache
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from recipes.models import Ingredients
+        response = client.get('/api/ingredients/?name=test')
+        etag = response.headers.get('ETag')
+        assert etag and 'max-age' in response.headers.get('Cache-Control', ''), (
+            'Проверьте, что при GET запросе `/api/ingredients/` в ответе есть '
+            'заголовки ETag и Cache-Control'
+        )
+        with CaptureQueriesContext(connection) as context:
+            response = client.get('/api/ingredients/?name=test', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304 and not context.captured_queries, (
+            'Проверьте, что условный GET запрос `/api/ingredients/` с актуальным ETag '
+            'получает ответ 304 без запросов к базе'
+        )
+        cache.clear()
+        response = client.get('/api/ingredients/?name=test', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304, (
+            'Проверьте, что версия справочника хранится в базе и не теряется '
+            'вместе с кэшем процесса'
+        )
+        CacheVersion.objects.filter(key='dictionary:ingredients').update(tag='other')
+        cache.clear()
+        response = client.get('/api/ingredients/?name=test', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200 and response.headers['ETag'] != etag, (
+            'Проверьте, что версия справочника, измененная другим процессом, '
+            'читается из базы'
+        )
+        etag = response.headers['ETag']
+        Ingredients.objects.create(name='Test_new', measurement_unit='г')
+        response = client.get('/api/ingredients/?name=test', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200 and len(response.json()) == 2, (
+            'Проверьте, что после изменения справочника ингридиентов ETag меняется'
+        )
+        response = client.get('/api/ingredients/666/')
+        assert response.status_code == 404 and not response.has_header('ETag')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_13_ingredients_snapshot(self, client, ingredients):
+        import gzip
+        import json
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        expected = client.get('/api/ingredients/?name=').json()
+        response = client.get('/api/ingredients/')
+        assert response.status_code == 200 and response.json() == expected, (
+            'Проверьте, что полный список `/api/ingredients/` из готового JSON '
+            'совпадает с результатом сериализатора'
+        )
+        with CaptureQueriesContext(connection) as context:
+            response = client.get('/api/ingredients/', HTTP_ACCEPT_ENCODING='gzip, br')
+        assert not context.captured_queries, (
+            'Проверьте, что повторный GET запрос `/api/ingredients/` '
+            'не обращается к базе данных'
+        )
+        assert response.headers.get('Content-Encoding') == 'gzip', (
+            'Проверьте, что при Accept-Encoding: gzip список отдается сжатым'
+        )
+        assert json.loads(gzip.decompress(response.content)) == expected
+        assert 'Accept-Encoding' in response.headers.get('Vary', '')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_14_load_ingredients_command(self, client, ingredients, tmp_path):
+        import io
+        import json
+        from api.models import CacheVersion
+        from django.core.cache import cache
+        from django.core.management import CommandError, call_command
+        from recipes.management.commands.load_ingredients import read_json
+        from recipes.models import Ingredients
+        response = client.get('/api/ingredients/')
+        assert response.json() == [
+            {'id': ingredients.id, 'name': 'Test_Ingredients', 'measurement_unit': 'liter'}
+        ]
+        etag = response.headers['ETag']
+        version = CacheVersion.objects.get(key='dictionary:ingredients').tag
+        csv_file = tmp_path / 'ingredients.csv'
+        csv_file.write_text(
+            'соль,г\nсахар,г\nсоль,г\nTest_Ingredients,liter\n,г\n', encoding='utf-8'
+        )
+        output = io.StringIO()
+        call_command('load_ingredients', str(csv_file), batch_size=1, stdout=output)
+        assert 'Прочитано 3, добавлено 2' in output.getvalue(), (
+            'Проверьте, что команда load_ingredients отбрасывает повторы и '
+            'существующие ингридиенты'
+        )
+        assert Ingredients.objects.count() == 3
+        assert CacheVersion.objects.get(key='dictionary:ingredients').tag != version
+        cache.clear()
+        response = client.get('/api/ingredients/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200 and len(response.json()) == 3, (
+            'Проверьте, что после загрузки ингридиентов меняется версия '
+            'справочника в базе, которую видит процесс сервера'
+        )
+        items = [
+            {'name': f'ингридиент {num}', 'measurement_unit': 'г'} for num in range(50)
+        ]
+        json_file = tmp_path / 'data.json'
+        json_file.write_text(json.dumps(items, ensure_ascii=False), encoding='utf-8')
+        call_command('load_ingredients', str(json_file), format='json', stdout=io.StringIO())
+        assert Ingredients.objects.count() == 53
+        assert list(read_json(io.StringIO(json.dumps(items)), read_size=7)) == [
+            (item['name'], item['measurement_unit']) for item in items
+        ], (
+            'Проверьте, что JSON читается частями'
+        )
+        for item in (['соль', 'г'], {'name': None, 'measurement_unit': 'г'},
+                     {'name': 'соль', 'measurement_unit': 5}):
+            json_file.write_text(
+                json.dumps([items[0], item], ensure_ascii=False), encoding='utf-8'
+            )
+            with pytest.raises(CommandError, match='Элемент 1 массива'):
+                call_command('load_ingredients', str(json_file), stdout=io.StringIO())
+        assert Ingredients.objects.count() == 53, (
+            'Проверьте, что некорректный элемент JSON прерывает загрузку '
+            'с номером элемента'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_15_search_ingredient_non_ascii(self, client, settings):
+        from recipes.models import Ingredients
+        milk = Ingredients.objects.create(name='молоко', measurement_unit='мл')
+        Ingredients.objects.create(name='мука', measurement_unit='г')
+        for search_index in (False, True):
+            settings.INGREDIENTS_SEARCH_INDEX = search_index
+            data = client.get('/api/ingredients/?name=мол').json()
+            assert [row['id'] for row in data] == [milk.id], (
+                'Проверьте, что поиск ингридиента находит названия не латиницей '
+                f'(INGREDIENTS_SEARCH_INDEX={search_index})'
+            )
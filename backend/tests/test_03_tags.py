@@ -98,3 +98,31 @@ class Test01TagsAPI:
         assert response.status_code == 405, (
             'Проверьте, что при PATCH запросе `/api/tags/{id}/` возвращаете статус 405'
         )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_tags_http_cache(self, client, tags):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        for url in ('/api/tags/', f'/api/tags/{tags.id}/'):
+            response = client.get(url)
+            etag = response.headers.get('ETag')
+            assert etag and response.headers.get('Last-Modified'), (
+                f'Проверьте, что при GET запросе `{url}` в ответе есть '
+                'заголовки ETag и Last-Modified'
+            )
+            assert 'max-age' in response.headers.get('Cache-Control', ''), (
+                f'Проверьте, что при GET запросе `{url}` в ответе есть '
+                'заголовок Cache-Control с max-age'
+            )
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == 304 and not context.captured_queries, (
+                f'Проверьте, что условный GET запрос `{url}` с актуальным ETag '
+                'получает ответ 304 без запросов к базе'
+            )
+        tags.name = 'New name'
+        tags.save()
+        response = client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200 and response.json()[0]['name'] == 'New name', (
+            'Проверьте, что после изменения тега ETag меняется'
+        )
@@ -333,6 +333,676 @@ class Test01RecipesAPI:
             'возвращается статус 404'
         )
 
+    @pytest.mark.django_db(transaction=True)
+    def test_13_recipes_flags_query_count(self, user_client, user, tags, ingredients, mock_media):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from recipes.models import FavoriteRecipes, Recipes, ShoppingCart
+        for num in range(6):
+            new_recipe = Recipes.objects.create(
+                author=user,
+                name=f'Test recipe {num}',
+                text='Test Text',
+                cooking_time=2,
+                image='http://foodgram.example.org/media/recipes/images/image.jpeg'
+            )
+            new_recipe.tags.add(tags)
+            new_recipe.ingredients.add(ingredients, through_defaults={'amount': 3})
+            FavoriteRecipes.objects.create(user=user, recipe=new_recipe)
+            ShoppingCart.objects.create(user=user, recipe=new_recipe)
 
+        def flag_queries(limit):
+            with CaptureQueriesContext(connection) as context:
+                response = user_client.get(f'/api/recipes/?limit={limit}')
+            assert response.status_code == 200
+            for result in response.json()['results']:
+                assert result['is_favorited'] and result['is_in_shopping_cart'], (
+                    'Проверьте, что при GET запросе `/api/recipes/` '
+                    'поля is_favorited и is_in_shopping_cart заполнены верно'
+                )
+            return [
+                query['sql'] for query in context.captured_queries
+                if 'favoriterecipes' in query['sql']
+                or 'shoppingcart' in query['sql']
+            ]
 
+        assert len(flag_queries(1)) == len(flag_queries(6)), (
+            'Проверьте, что при GET запросе `/api/recipes/` количество запросов '
+            'для полей is_favorited и is_in_shopping_cart не зависит от размера страницы'
+        )
 
+    @pytest.mark.django_db(transaction=True)
+    def test_14_recipes_list_query_count(self, client, user, user_test, tags, ingredients,
+                                         search_ingredients, mock_media):
+        from api.cache import get_recipes_version
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from recipes.models import Recipes
+        for num in range(6):
+            new_recipe = Recipes.objects.create(
+                author=user if num % 2 else user_test,
+                name=f'Test recipe {num}',
+                text='Test Text',
+                cooking_time=2,
+                image='http://foodgram.example.org/media/recipes/images/image.jpeg'
+            )
+            new_recipe.tags.add(tags)
+            new_recipe.ingredients.add(ingredients, through_defaults={'amount': 3})
+            new_recipe.ingredients.add(search_ingredients, through_defaults={'amount': 1})
+        get_recipes_version()
+
+        def count_queries(limit):
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(f'/api/recipes/?limit={limit}')
+            assert response.status_code == 200
+            assert len(response.json()['results']) == limit
+            return len(context.captured_queries)
+
+        assert count_queries(1) == count_queries(6), (
+            'Проверьте, что количество запросов при GET запросе `/api/recipes/` '
+            'не зависит от размера страницы'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_15_recipes_anonymous_cache(self, client, user_client, recipe, tags):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        url = f'/api/recipes/?tags={tags.slug}&limit=5'
+        expected = client.get(url).json()
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(f'/api/recipes/?limit=5&tags={tags.slug}')
+        assert response.status_code == 200 and response.json() == expected, (
+            'Проверьте, что выдача рецептов из кэша совпадает с исходной'
+        )
+        assert not context.captured_queries, (
+            'Проверьте, что повторный GET запрос `/api/recipes/` от анонимного '
+            'пользователя с теми же параметрами отдается из кэша'
+        )
+        client.get(f'/api/recipes/{recipe.id}/')
+        with CaptureQueriesContext(connection) as context:
+            client.get(f'/api/recipes/{recipe.id}/')
+        assert not context.captured_queries, (
+            'Проверьте, что повторный GET запрос `/api/recipes/{id}/` от '
+            'анонимного пользователя отдается из кэша'
+        )
+        with CaptureQueriesContext(connection) as context:
+            user_client.get(url)
+        assert context.captured_queries, (
+            'Проверьте, что выдача рецептов авторизованному пользователю '
+            'не берется из кэша'
+        )
+        recipe.name = 'Updated recipe'
+        recipe.save()
+        assert client.get(url).json()['results'][0]['name'] == 'Updated recipe', (
+            'Проверьте, что кэш выдачи рецептов сбрасывается при изменении рецепта'
+        )
+        assert client.get(f'/api/recipes/{recipe.id}/').json()['name'] == 'Updated recipe'
+        assert client.get('/api/recipes/').json()['count'] == 1
+        user_client.delete(f'/api/recipes/{recipe.id}/')
+        assert client.get('/api/recipes/').json()['count'] == 0, (
+            'Проверьте, что кэш выдачи рецептов сбрасывается при удалении рецепта'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_16_recipes_cursor_pagination(self, client, user, tags, mock_media):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from recipes.models import Recipes
+        for num in range(7):
+            Recipes.objects.create(
+                author=user,
+                name=f'Test recipe {num}',
+                text='Test Text',
+                cooking_time=2,
+                image='http://foodgram.example.org/media/recipes/images/image.jpeg'
+            )
+        expected = list(
+            Recipes.objects.order_by('-pub_date', '-id').values_list('id', flat=True)
+        )
+        url = '/api/recipes/?pagination=cursor&limit=3'
+        ids = []
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        data = response.json()
+        assert response.status_code == 200 and 'count' not in data, (
+            'Проверьте, что в режиме `?pagination=cursor` выдача рецептов '
+            'не содержит общего количества'
+        )
+        assert not any(
+            'COUNT(' in query['sql'].upper() for query in context.captured_queries
+        ), (
+            'Проверьте, что в режиме `?pagination=cursor` не выполняется COUNT'
+        )
+        assert data['previous'] is None
+        ids.extend(recipe['id'] for recipe in data['results'])
+        while data['next']:
+            data = client.get(data['next']).json()
+            ids.extend(recipe['id'] for recipe in data['results'])
+        assert ids == expected, (
+            'Проверьте, что курсоры next обходят все рецепты в порядке '
+            'убывания даты публикации без повторов'
+        )
+        previous = client.get(data['previous']).json()
+        assert [recipe['id'] for recipe in previous['results']] == expected[3:6], (
+            'Проверьте, что курсор previous возвращает предыдущую страницу'
+        )
+        response = client.get('/api/recipes/?limit=3')
+        assert response.json()['count'] == 7, (
+            'Проверьте, что по умолчанию используется пагинация по номеру страницы'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_17_recipes_admin_query_count(self, client, user_superuser, user, user_test,
+                                          tags, mock_media):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from recipes.models import FavoriteRecipes, Recipes
+        client.force_login(user_superuser)
+
+        def add_recipes(start, stop):
+            for num in range(start, stop):
+                new_recipe = Recipes.objects.create(
+                    author=user if num % 2 else user_test,
+                    name=f'Test recipe {num}',
+                    text='Test Text',
+                    cooking_time=2,
+                    image='http://foodgram.example.org/media/recipes/images/image.jpeg'
+                )
+                new_recipe.tags.add(tags)
+                FavoriteRecipes.objects.create(user=user, recipe=new_recipe)
+
+        def count_queries(url):
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(url)
+            assert response.status_code == 200
+            return len(context.captured_queries)
+
+        url = '/admin/recipes/recipes/?o=5'
+        add_recipes(0, 2)
+        queries = count_queries(url)
+        add_recipes(2, 8)
+        assert count_queries(url) == queries, (
+            'Проверьте, что количество запросов страницы рецептов в админке '
+            'не зависит от количества рецептов'
+        )
+        assert count_queries(f'/admin/recipes/recipes/?tags__id__exact={tags.id}') == queries
+        assert count_queries(f'/admin/recipes/recipes/?author__id__exact={user.id}') == queries
+
+    @pytest.mark.django_db(transaction=True)
+    def test_18_import_export_recipes(self, client, recipe, user, tags, ingredients,
+                                      search_ingredients, tmp_path):
+        import io
+        import json
+        from django.core.management import call_command
+        from recipes.models import IngredientInRecipe, Recipes
+        assert client.get('/api/recipes/').json()['count'] == 1
+        export_file = tmp_path / 'recipes.ndjson'
+        call_command('export_recipes', str(export_file), stderr=io.StringIO())
+        exported = [json.loads(line) for line in export_file.read_text(encoding='utf-8').splitlines()]
+        assert exported == [{
+            'author': user.username,
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'image': recipe.image.name,
+            'tags': [tags.slug],
+            'ingredients': [
+                {'name': ingredients.name, 'measurement_unit': ingredients.measurement_unit,
+                 'amount': 3}
+            ],
+        }], (
+            'Проверьте, что export_recipes выгружает рецепты в NDJSON'
+        )
+        records = [
+            dict(exported[0], name=f'Imported {num}', ingredients=[
+                {'name': search_ingredients.name,
+                 'measurement_unit': search_ingredients.measurement_unit,
+                 'amount': num + 1}
+            ])
+            for num in range(5)
+        ]
+        records.append(exported[0])
+        records.append(dict(exported[0], name='Bad', tags=['unknown']))
+        import_file = tmp_path / 'import.ndjson'
+        import_file.write_text(
+            '\n'.join(json.dumps(record) for record in records) + '\nnot json\n',
+            encoding='utf-8'
+        )
+        output, errors = io.StringIO(), io.StringIO()
+        call_command(
+            'import_recipes', str(import_file), batch_size=2,
+            stdout=output, stderr=errors
+        )
+        assert 'добавлено 5, пропущено 1, ошибок 2' in output.getvalue(), (
+            'Проверьте, что import_recipes пропускает существующие рецепты '
+            'и строки с ошибками'
+        )
+        assert 'неизвестный тег unknown' in errors.getvalue()
+        imported = Recipes.objects.filter(name__startswith='Imported').order_by('name')
+        assert [list(item.tags.all()) for item in imported] == [[tags]] * 5
+        assert [
+            list(IngredientInRecipe.objects.filter(recipe=item).values_list(
+                'ingredient_id', 'amount'))
+            for item in imported
+        ] == [[(search_ingredients.id, num + 1)] for num in range(5)], (
+            'Проверьте, что import_recipes сохраняет ингридиенты рецептов'
+        )
+        user.refresh_from_db()
+        assert user.recipes_count == 6
+        assert client.get('/api/recipes/').json()['count'] == 6, (
+            'Проверьте, что после импорта меняется версия выдачи рецептов'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_19_recipes_patch_delta(self, user_client, recipe, tags, ingredients,
+                                    search_ingredients, shopping_cart):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from recipes.models import IngredientInRecipe, Tags
+        url = f'/api/recipes/{recipe.id}/'
+
+        def join_writes(context):
+            return [
+                query['sql'] for query in context.captured_queries
+                if ('recipes_ingredientinrecipe' in query['sql']
+                    or 'recipes_recipes_tags' in query['sql'])
+                and not query['sql'].startswith('SELECT')
+            ]
+
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.patch(url, data={'cooking_time': 15}, format='json')
+        assert response.status_code == 200 and response.json()['cooking_time'] == 15
+        assert not join_writes(context), (
+            'Проверьте, что PATCH запрос без тегов и ингридиентов '
+            'не перезаписывает связи рецепта'
+        )
+        row_id = IngredientInRecipe.objects.get(recipe=recipe).id
+        etag = user_client.get('/api/recipes/download_shopping_cart/?format=txt')['ETag']
+        new_tag = Tags.objects.create(name='New tag', color='#000000', slug='new_slug')
+        data = {
+            'tags': [new_tag.id],
+            'ingredients': [
+                {'id': ingredients.id, 'amount': 7},
+                {'id': search_ingredients.id, 'amount': 2},
+            ],
+        }
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.patch(url, data=data, format='json')
+        assert response.status_code == 200
+        assert len(join_writes(context)) == 4, (
+            'Проверьте, что при изменении рецепта теги и ингридиенты меняются '
+            'одним удалением, одним обновлением и вставками только новых связей'
+        )
+        assert [tag['id'] for tag in response.json()['tags']] == [new_tag.id]
+        assert sorted(
+            (item['id'], item['amount']) for item in response.json()['ingredients']
+        ) == sorted([(ingredients.id, 7), (search_ingredients.id, 2)])
+        assert IngredientInRecipe.objects.filter(id=row_id, amount=7).exists(), (
+            'Проверьте, что при изменении количества строка ингридиента '
+            'обновляется, а не пересоздается'
+        )
+        response = user_client.get(
+            '/api/recipes/download_shopping_cart/?format=txt', HTTP_IF_NONE_MATCH=etag
+        )
+        assert response.status_code == 200, (
+            'Проверьте, что изменение ингридиентов рецепта меняет версию '
+            'списка покупок'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_20_recipes_post_batched_ids(self, user_client, tags, mock_media):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from recipes.models import Ingredients, Tags
+        new_tags = [tags] + [
+            Tags.objects.create(name=f'Tag {num}', color=f'#00000{num}', slug=f'tag_{num}')
+            for num in range(3)
+        ]
+        ingredients = [
+            Ingredients.objects.create(name=f'Ingredient {num}', measurement_unit='г')
+            for num in range(6)
+        ]
+        data = {
+            'name': 'Batched recipe',
+            'text': 'Test Text',
+            'cooking_time': 11,
+            'tags': [tag.id for tag in new_tags],
+            'ingredients': [
+                {'id': ingredient.id, 'amount': 2} for ingredient in ingredients
+            ],
+            'image': 'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABieywaAAAACVBMVEUAAAD///9fX1'
+                     '/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACklEQVQImWNoAAAAggCByxOyYQAAAABJRU5ErkJggg== '
+        }
+
+        def lookups(context, table):
+            return [
+                query['sql'] for query in context.captured_queries
+                if query['sql'].startswith('SELECT')
+                and f'FROM "{table}" WHERE' in query['sql']
+            ]
+
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.post('/api/recipes/', data=data, format='json')
+        assert response.status_code == 201
+        assert len(lookups(context, 'recipes_ingredients')) == 1, (
+            'Проверьте, что ингридиенты рецепта проверяются одним запросом'
+        )
+        assert len(lookups(context, 'recipes_tags')) == 1, (
+            'Проверьте, что теги рецепта проверяются одним запросом'
+        )
+        data.update(
+            name='Invalid recipe',
+            tags=[tags.id, 999, 'abc'],
+            ingredients=[{'id': ingredients[0].id, 'amount': 2}, {'id': 999, 'amount': 2}],
+        )
+        response = user_client.post('/api/recipes/', data=data, format='json')
+        assert response.status_code == 400
+        errors = response.json()
+        assert errors['tags'][0] == {} and errors['tags'][1] == {'id': ['Тега нет в базе']}
+        assert 'id' in errors['tags'][2]
+        assert errors['ingredients'] == [{}, {'id': ['Ингридиента нет в базе']}], (
+            'Проверьте, что сообщения об отсутствующих ингридиентах и тегах '
+            'не изменились'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_21_recipes_image_renditions(self, user_client, tags, ingredients, mock_media,
+                                         settings):
+        import base64
+        import io
+        import os
+        from PIL import Image
+        from recipes.images import make_renditions
+        from recipes.models import Recipes
+        from rest_framework.test import APIClient
+        image = Image.new('RGB', (1600, 1200), (200, 100, 50))
+        buffer = io.BytesIO()
+        image.save(buffer, 'PNG')
+        encoded = base64.b64encode(buffer.getvalue()).decode()
+        data = {
+            'name': 'Recipe with image',
+            'text': 'Test Text',
+            'cooking_time': 11,
+            'tags': [tags.id],
+            'ingredients': [{'id': ingredients.id, 'amount': 2}],
+            'image': f'data:image/png;base64,{encoded}',
+        }
+        response = user_client.post('/api/recipes/', data=data, format='json')
+        assert response.status_code == 201
+        recipe_id = response.json()['id']
+        renditions = user_client.get(f'/api/recipes/{recipe_id}/').json()['image_renditions']
+        assert set(renditions) == {'thumbnail', 'medium'}, (
+            'Проверьте, что в ответе есть ссылки на уменьшенные копии картинки'
+        )
+        sizes = {}
+        for rendition, url in renditions.items():
+            assert url.endswith(f'_{rendition}.webp'), (
+                'Проверьте, что ссылки ведут на копии в формате WebP'
+            )
+            path = os.path.join(mock_media, url.split(settings.MEDIA_URL, 1)[1])
+            with Image.open(path) as rendered:
+                sizes[rendition] = rendered.size
+        assert sizes == {'thumbnail': (320, 240), 'medium': (960, 720)}, (
+            'Проверьте размеры уменьшенных копий картинки'
+        )
+        listed = user_client.get('/api/recipes/').json()['results'][0]
+        assert listed['image_renditions'] == renditions
+
+        recipe = Recipes.objects.get(id=recipe_id)
+        Recipes.objects.filter(id=recipe_id).update(renditions_source='')
+        original = user_client.get('/api/recipes/').json()['results'][0]['image']
+        anonymous = APIClient()
+        assert anonymous.get('/api/recipes/').json()['results'][0]['image_renditions'] == {
+            'thumbnail': original, 'medium': original
+        }, (
+            'Проверьте, что до готовности копий ссылки ведут на исходную картинку'
+        )
+        make_renditions(recipe_id, recipe.image.name)
+        assert anonymous.get('/api/recipes/').json()['results'][0]['image_renditions'] == (
+            renditions
+        ), (
+            'Проверьте, что после создания копий кэш выдачи рецептов сбрасывается'
+        )
+
+        settings.RECIPE_IMAGE_MAX_SIZE = len(buffer.getvalue()) - 1
+        response = user_client.post(
+            '/api/recipes/', data=dict(data, name='Too large'), format='json'
+        )
+        assert response.status_code == 400 and 'image' in response.json(), (
+            'Проверьте, что картинка больше RECIPE_IMAGE_MAX_SIZE не принимается'
+        )
+        response = user_client.post(
+            '/api/recipes/', data=dict(data, name='Broken', image='data:image/png;base64,@@@'),
+            format='json'
+        )
+        assert response.status_code == 400 and 'image' in response.json(), (
+            'Проверьте, что некорректная картинка не принимается'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_22_recipes_image_deduplication(self, user_client, tags, ingredients, mock_media):
+        import base64
+        import io
+        import os
+        from PIL import Image
+        from recipes.images import RENDITIONS, get_rendition_name
+        from recipes.models import Recipes, StoredImage
+
+        def encode(color):
+            buffer = io.BytesIO()
+            Image.new('RGB', (64, 48), color).save(buffer, 'PNG')
+            return 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+        def paths(name):
+            return [os.path.join(mock_media, name)] + [
+                os.path.join(mock_media, get_rendition_name(name, rendition))
+                for rendition in RENDITIONS
+            ]
+
+        data = {
+            'text': 'Test Text',
+            'cooking_time': 11,
+            'tags': [tags.id],
+            'ingredients': [{'id': ingredients.id, 'amount': 2}],
+            'image': encode((10, 20, 30)),
+        }
+        first = user_client.post('/api/recipes/', data=dict(data, name='First'), format='json')
+        second = user_client.post('/api/recipes/', data=dict(data, name='Second'), format='json')
+        assert first.status_code == 201 and second.status_code == 201
+        first_id, second_id = first.json()['id'], second.json()['id']
+        image_name = Recipes.objects.get(id=first_id).image.name
+        assert Recipes.objects.get(id=second_id).image.name == image_name, (
+            'Проверьте, что одинаковые картинки хранятся одним файлом'
+        )
+        assert first.json()['image'] == second.json()['image']
+        directory = os.path.join(mock_media, os.path.dirname(image_name))
+        assert len([
+            name for name in os.listdir(directory) if name.endswith('.png')
+        ]) == 1, 'Проверьте, что повторная картинка не записывается заново'
+        assert all(map(os.path.exists, paths(image_name)))
+
+        response = user_client.delete(f'/api/recipes/{first_id}/')
+        assert response.status_code == 204
+        assert all(map(os.path.exists, paths(image_name))), (
+            'Проверьте, что картинка, которая используется другим рецептом, не удаляется'
+        )
+
+        response = user_client.patch(
+            f'/api/recipes/{second_id}/', data={'image': encode((40, 50, 60))}, format='json'
+        )
+        assert response.status_code == 200
+        assert not any(map(os.path.exists, paths(image_name))), (
+            'Проверьте, что замененная картинка без ссылок удаляется вместе с копиями'
+        )
+        new_name = Recipes.objects.get(id=second_id).image.name
+        assert new_name != image_name and all(map(os.path.exists, paths(new_name)))
+
+        response = user_client.delete(f'/api/recipes/{second_id}/')
+        assert response.status_code == 204
+        assert not any(map(os.path.exists, paths(new_name))), (
+            'Проверьте, что картинка удаленного рецепта без ссылок удаляется'
+        )
+        assert not StoredImage.objects.filter(name__in=[image_name, new_name]).exists(), (
+            'Проверьте, что запись файла картинки удаляется вместе с файлом'
+        )
+
+        response = user_client.post('/api/recipes/', data=dict(data, name='Third'), format='json')
+        assert response.status_code == 201
+        assert Recipes.objects.get(id=response.json()['id']).image.name == image_name
+        assert all(map(os.path.exists, paths(image_name))), (
+            'Проверьте, что удаленная картинка записывается заново при повторной загрузке'
+        )
+        assert StoredImage.objects.filter(name=image_name).exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_23_import_recipes_invalid_types(self, recipe, user, tags, ingredients,
+                                             monkeypatch):
+        import io
+        import json
+        from django.core.management import call_command
+        from recipes.models import Recipes
+        record = {
+            'author': user.username,
+            'name': 'Imported',
+            'text': 'Test Text',
+            'cooking_time': 5,
+            'image': recipe.image.name,
+            'tags': [tags.slug],
+            'ingredients': [
+                {'name': ingredients.name, 'measurement_unit': ingredients.measurement_unit,
+                 'amount': 2}
+            ],
+        }
+        ingredient = record['ingredients'][0]
+        invalid = [
+            dict(record, name='Bad 1', tags=[[tags.slug]]),
+            dict(record, name='Bad 2', tags={tags.slug: 1}),
+            dict(record, name='Bad 3', author=[user.username]),
+            dict(record, name='Bad 4', ingredients=[dict(ingredient, name={'a': 1})]),
+            dict(record, name='Bad 5', ingredients=[dict(ingredient, measurement_unit=[1])]),
+            dict(record, name='Bad 6', cooking_time=True),
+            dict(record, name='Bad 7', ingredients=[dict(ingredient, amount=True)]),
+        ]
+        stdin = io.StringIO(
+            '\n'.join(json.dumps(item) for item in invalid + [record]) + '\n'
+        )
+        monkeypatch.setattr('sys.stdin', stdin)
+        output, errors = io.StringIO(), io.StringIO()
+        call_command('import_recipes', '-', batch_size=1, stdout=output, stderr=errors)
+        assert 'добавлено 1, пропущено 0, ошибок 7' in output.getvalue(), (
+            'Проверьте, что import_recipes сообщает о значениях неверного типа '
+            'и продолжает импорт'
+        )
+        assert len(errors.getvalue().splitlines()) == 7
+        assert Recipes.objects.filter(name='Imported').exists()
+        assert not stdin.closed, (
+            'Проверьте, что import_recipes не закрывает stdin'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_24_image_delete_waits_for_upload(self, user, user_test, mock_media):
+        import os
+        import threading
+        from django.core.files.base import ContentFile
+        from django.db import connection, connections, transaction
+        from recipes.models import Recipes
+        if connection.vendor != 'postgresql':
+            pytest.skip('Блокировка строк проверяется только на PostgreSQL')
+        first = Recipes.objects.create(
+            author=user, name='First', text='Test Text', cooking_time=1,
+            image=ContentFile(b'image', name='temp.png')
+        )
+        image_name = first.image.name
+
+        def delete_first():
+            try:
+                Recipes.objects.filter(pk=first.pk).delete()
+            finally:
+                connections.close_all()
+
+        with transaction.atomic():
+            second = Recipes.objects.create(
+                author=user_test, name='Second', text='Test Text', cooking_time=1,
+                image=ContentFile(b'image', name='temp.png')
+            )
+            thread = threading.Thread(target=delete_first)
+            thread.start()
+            thread.join(0.5)
+            assert thread.is_alive(), (
+                'Проверьте, что удаление картинки ждет транзакцию, '
+                'которая сохраняет рецепт с такой же картинкой'
+            )
+        thread.join()
+        assert second.image.name == image_name
+        assert os.path.exists(os.path.join(mock_media, image_name)), (
+            'Проверьте, что картинка, загруженная во время удаления, не удаляется'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_25_recipes_version_author_changes(self, recipe, user, user_test):
+        from api.cache import get_recipes_version
+        from django.contrib.auth import get_user_model
+        from django.db import transaction
+        User = get_user_model()
+        version = get_recipes_version()
+        new_user = User.objects.create_user(
+            username='NewUser', email='newuser@yamdb.fake', password='1234567'
+        )
+        new_user.first_name = 'Renamed'
+        new_user.save()
+        stale = User.objects.get(pk=user.pk)
+        stale.set_password('new password 123')
+        stale.save()
+        user_test.last_name = 'Renamed'
+        user_test.save()
+        assert get_recipes_version() == version, (
+            'Проверьте, что версия выдачи рецептов не меняется при изменении '
+            'пользователей без рецептов и полей, которых нет в выдаче'
+        )
+        with transaction.atomic():
+            stale.first_name = 'Renamed'
+            stale.save()
+            recipe.name = 'Renamed recipe'
+            recipe.save()
+            assert get_recipes_version() == version, (
+                'Проверьте, что версия выдачи рецептов меняется после '
+                'фиксации транзакции'
+            )
+        assert get_recipes_version() != version, (
+            'Проверьте, что изменение имени автора меняет версию выдачи рецептов'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_26_recipes_image_pixels_and_pending_renditions(self, user_client, tags,
+                                                             ingredients, mock_media,
+                                                             settings):
+        import base64
+        import io
+        from django.core.management import call_command
+        from PIL import Image
+        from recipes.models import Recipes
+        buffer = io.BytesIO()
+        Image.new('RGB', (400, 300), (10, 20, 30)).save(buffer, 'PNG')
+        data = {
+            'name': 'Recipe with image',
+            'text': 'Test Text',
+            'cooking_time': 11,
+            'tags': [tags.id],
+            'ingredients': [{'id': ingredients.id, 'amount': 2}],
+            'image': 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode(),
+        }
+        settings.RECIPE_IMAGE_MAX_PIXELS = 400 * 300 - 1
+        response = user_client.post('/api/recipes/', data=data, format='json')
+        assert response.status_code == 400 and 'image' in response.json(), (
+            'Проверьте, что картинка больше RECIPE_IMAGE_MAX_PIXELS пикселей '
+            'не принимается'
+        )
+        settings.RECIPE_IMAGE_MAX_PIXELS = 400 * 300
+        response = user_client.post('/api/recipes/', data=data, format='json')
+        assert response.status_code == 201
+        recipe_id = response.json()['id']
+        Recipes.objects.filter(id=recipe_id).update(renditions_source='')
+        call_command('make_renditions')
+        assert Recipes.objects.get(id=recipe_id).has_renditions(), (
+            'Проверьте, что команда make_renditions создает недостающие копии'
+        )
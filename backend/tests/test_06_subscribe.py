@@ -188,3 +188,126 @@ class Test01SubscribeUserAPI:
             'в ответе есть описание ошибки'
         )
 
+    @pytest.mark.django_db(transaction=True)
+    def test_12_subscriptions_recipes_preview(self, user_client, user, mock_media):
+        from django.contrib.auth import get_user_model
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from recipes.models import Recipes
+        from users.models import Subscriptions
+        User = get_user_model()
+
+        def add_authors(start, stop):
+            for num in range(start, stop):
+                author = User.objects.create_user(
+                    username=f'TestAuthor{num}',
+                    email=f'testauthor{num}@yamdb.fake',
+                    password='123456789',
+                )
+                for recipe_num in range(4):
+                    Recipes.objects.create(
+                        author=author,
+                        name=f'Recipe {num} {recipe_num}',
+                        text='Test Text',
+                        cooking_time=2,
+                        image='http://foodgram.example.org/media/recipes/images/image.jpeg'
+                    )
+                Subscriptions.objects.create(author=author, user=user)
+
+        def get_subscriptions():
+            with CaptureQueriesContext(connection) as context:
+                response = user_client.get('/api/users/subscriptions/?recipes_limit=2')
+            assert response.status_code == 200
+            return response.json()['results'], len(context.captured_queries)
+
+        add_authors(0, 1)
+        results, single_queries = get_subscriptions()
+        add_authors(1, 4)
+        results, queries = get_subscriptions()
+        assert queries == single_queries, (
+            'Проверьте, что количество запросов при GET запросе '
+            '`/api/users/subscriptions/` не зависит от количества авторов'
+        )
+        for result in results:
+            expected = list(
+                Recipes.objects.filter(author_id=result['id']).
+                order_by('-pub_date', '-id').values_list('id', flat=True)[:2]
+            )
+            assert [recipe['id'] for recipe in result['recipes']] == expected, (
+                'Проверьте, что в подписках выводятся последние recipes_limit '
+                'рецептов каждого автора'
+            )
+            assert result['recipes_count'] == 4
+
+    @pytest.mark.django_db(transaction=True)
+    def test_13_denormalized_counters(self, user_client, user, admin, user_superuser,
+                                      recipe):
+        from django.core.management import call_command
+        from recipes.models import Recipes
+        from users.models import Subscriptions, User
+        user.refresh_from_db()
+        assert user.recipes_count == 1, (
+            'Проверьте, что при создании рецепта увеличивается recipes_count автора'
+        )
+        response = user_client.post(f'/api/users/{admin.id}/subscribe/')
+        admin.refresh_from_db()
+        assert admin.followers_count == 1, (
+            'Проверьте, что при подписке увеличивается followers_count автора'
+        )
+        assert 'followers_count' not in response.json(), (
+            'Проверьте, что количество подписчиков не отдается в API'
+        )
+        user_client.post(f'/api/recipes/{recipe.id}/favorite/')
+        recipe.refresh_from_db()
+        assert recipe.favorites_count == 1, (
+            'Проверьте, что при добавлении в избранное увеличивается favorites_count'
+        )
+        user_client.delete(f'/api/users/{admin.id}/subscribe/')
+        user_client.delete(f'/api/recipes/{recipe.id}/favorite/')
+        admin.refresh_from_db()
+        recipe.refresh_from_db()
+        assert admin.followers_count == 0 and recipe.favorites_count == 0, (
+            'Проверьте, что при удалении подписки и избранного счетчики уменьшаются'
+        )
+        Subscriptions.objects.bulk_create([Subscriptions(author=user, user=admin)])
+        Recipes.objects.filter(pk=recipe.pk).update(favorites_count=5)
+        call_command('recompute_counters')
+        user.refresh_from_db()
+        recipe.refresh_from_db()
+        assert user.followers_count == 1 and recipe.favorites_count == 0, (
+            'Проверьте, что команда recompute_counters пересчитывает счетчики'
+        )
+        stale_user = User.objects.get(pk=user.pk)
+        stale_recipe = Recipes.objects.get(pk=recipe.pk)
+        user_client.post(f'/api/recipes/{recipe.id}/favorite/')
+        Subscriptions.objects.create(author=user, user=user_superuser)
+        stale_user.first_name = 'Renamed'
+        stale_user.save()
+        stale_recipe.name = 'Renamed recipe'
+        stale_recipe.save()
+        user.refresh_from_db()
+        recipe.refresh_from_db()
+        assert user.followers_count == 2 and user.first_name == 'Renamed', (
+            'Проверьте, что сохранение пользователя не перезаписывает счетчики'
+        )
+        assert recipe.favorites_count == 1 and recipe.name == 'Renamed recipe', (
+            'Проверьте, что сохранение рецепта не перезаписывает счетчики'
+        )
+        deferred_recipe = Recipes.objects.only('id', 'name').get(pk=recipe.pk)
+        Recipes.objects.filter(pk=recipe.pk).update(favorites_count=5)
+        deferred_recipe.name = 'Deferred'
+        deferred_recipe.save()
+        recipe.refresh_from_db()
+        assert recipe.favorites_count == 5 and recipe.name == 'Deferred', (
+            'Проверьте, что сохранение с отложенными полями не перезаписывает '
+            'счетчики'
+        )
+        Recipes.objects.get(pk=recipe.pk).delete()
+        user.refresh_from_db()
+        assert user.recipes_count == 0, (
+            'Проверьте, что при удалении рецепта уменьшается recipes_count автора'
+        )
+        recipe.save()
+        assert Recipes.objects.filter(pk=recipe.pk).exists(), (
+            'Проверьте, что сохранение удаленного рецепта вставляет его заново'
+        )
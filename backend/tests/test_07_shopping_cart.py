@@ -238,3 +238,229 @@ class Test01ShoppingCartAPI:
         assert response.status_code == 405, (
             'Проверьте, что при DELETE запросе `/api/recipes/download_shopping_cart/` возвращаете статус 405'
         )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_14_shopping_list_aggregation(self, user, shopping_cart, ingredients,
+                                          search_ingredients, tags):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from recipes.models import Recipes, ShoppingCart
+        from api.services import get_shopping_list
+        new_recipe = Recipes.objects.create(
+            author=user,
+            name='Second recipe',
+            text='Test Text',
+            cooking_time=2,
+            image='http://foodgram.example.org/media/recipes/images/image.jpeg'
+        )
+        new_recipe.tags.add(tags)
+        new_recipe.ingredients.add(ingredients, through_defaults={'amount': 4})
+        new_recipe.ingredients.add(search_ingredients, through_defaults={'amount': 2})
+        ShoppingCart.objects.create(user=user, recipe=new_recipe)
+        with CaptureQueriesContext(connection) as context:
+            shopping_list = list(get_shopping_list(user))
+        assert len(context.captured_queries) == 1, (
+            'Проверьте, что список покупок собирается одним запросом'
+        )
+        assert shopping_list == [
+            {'name': 'Search_Ingred', 'measurement_unit': 'кг', 'total': 2},
+            {'name': 'Test_Ingredients', 'measurement_unit': 'liter', 'total': 7},
+        ], (
+            'Проверьте, что в списке покупок количество одинаковых '
+            'ингридиентов суммируется'
+        )
+
+    def test_15_font_registered_once(self, monkeypatch):
+        from api import pdf
+        loaded = []
+        original = pdf.ttfonts.TTFont
+
+        def counting_ttfont(*args, **kwargs):
+            loaded.append(args)
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(pdf, '_font_registered', False)
+        monkeypatch.setattr(pdf.ttfonts, 'TTFont', counting_ttfont)
+        for _ in range(3):
+            assert pdf.register_font() == pdf.FONT_NAME
+        assert len(loaded) == 1, (
+            'Проверьте, что файл шрифта разбирается один раз на процесс'
+        )
+
+    def test_16_large_shopping_list_pdf(self):
+        import math
+        import re
+        import tracemalloc
+        from api import pdf
+        lines = 5000
+
+        def shopping_list(lines):
+            return (
+                {'name': f'Ингридиент {num}', 'measurement_unit': 'г', 'total': num}
+                for num in range(lines)
+            )
+
+        def measure_peak(lines):
+            tracemalloc.start()
+            try:
+                for chunk in pdf.stream_shopping_list(shopping_list(lines)):
+                    assert len(chunk) <= pdf.CHUNK_SIZE
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            return peak
+
+        first_page = (pdf.FIRST_LINE_Y - pdf.PAGE_BOTTOM_Y) // pdf.LINE_HEIGHT + 1
+        next_pages = (pdf.PAGE_TOP_Y - pdf.PAGE_BOTTOM_Y) // pdf.LINE_HEIGHT + 1
+        expected_pages = 1 + math.ceil((lines - first_page) / next_pages)
+        pdf.register_font()
+        document = b''.join(pdf.stream_shopping_list(shopping_list(lines)))
+        assert document.rstrip().endswith(b'%%EOF')
+        counts = re.findall(rb'/Count (\d+)', document)
+        assert [int(count) for count in counts] == [expected_pages], (
+            'Проверьте, что список покупок разбивается на страницы'
+        )
+        small_peak = measure_peak(lines // 5)
+        peak = measure_peak(lines)
+        assert peak < 4 * 1024 * 1024, (
+            'Проверьте, что генерация большого списка покупок '
+            'не расходует лишнюю память'
+        )
+        assert (peak - small_peak) / (lines - lines // 5) < 600, (
+            'Проверьте, что память на строку списка покупок не растет: '
+            'reportlab держит в памяти только сжатые страницы'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_17_download_shopping_cart_formats(self, user_client, shopping_cart):
+        url = '/api/recipes/download_shopping_cart/'
+        response = user_client.get(f'{url}?format=txt')
+        assert response.status_code == 200
+        assert response.headers['Content-Type'].startswith('text/plain'), (
+            'Проверьте, что при GET запросе `/api/recipes/download_shopping_cart/?format=txt`'
+            'возвращается ответ в текстовом формате'
+        )
+        content = b''.join(response.streaming_content).decode()
+        assert content == 'Список покупок:\n1. Test_Ingredients 3 liter\n'
+        response = user_client.get(url, HTTP_ACCEPT='text/csv')
+        assert response.status_code == 200
+        assert response.headers['Content-Type'].startswith('text/csv'), (
+            'Проверьте, что при GET запросе `/api/recipes/download_shopping_cart/`'
+            'с заголовком Accept: text/csv возвращается ответ в формате csv'
+        )
+        content = b''.join(response.streaming_content).decode()
+        assert content.splitlines() == [
+            'Ингридиент,Количество,Единица измерения',
+            'Test_Ingredients,3,liter',
+        ]
+        response = user_client.get(f'{url}?format=pdf')
+        assert response.headers['Content-Type'] == 'application/pdf'
+        response = user_client.get(f'{url}?format=xml')
+        assert response.status_code == 404, (
+            'Проверьте, что при запросе неподдерживаемого формата '
+            'возвращается статус 404'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_18_download_shopping_cart_etag(self, user_client, user, shopping_cart,
+                                            search_ingredients):
+        from api.models import CacheVersion
+        from django.apps import apps
+        from django.core.cache import cache
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from recipes.models import IngredientInRecipe
+        url = '/api/recipes/download_shopping_cart/?format=txt'
+        response = user_client.get(url)
+        content = b''.join(response.streaming_content)
+        etag = response.headers.get('ETag')
+        assert etag, (
+            'Проверьте, что при GET запросе `/api/recipes/download_shopping_cart/`'
+            'в ответе есть заголовок ETag'
+        )
+        response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304, (
+            'Проверьте, что при повторном запросе с заголовком If-None-Match '
+            'неизмененного списка покупок возвращается статус 304'
+        )
+        cache.clear()
+        response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304, (
+            'Проверьте, что версия списка покупок хранится в базе и не теряется '
+            'вместе с кэшем процесса'
+        )
+        CacheVersion.objects.filter(key=f'shopping_cart:{user.id}').update(tag='other')
+        response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200 and response.headers['ETag'] != etag, (
+            'Проверьте, что изменение списка покупок в другом процессе сразу '
+            'меняет ETag'
+        )
+        etag = response.headers['ETag']
+        content = b''.join(response.streaming_content)
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.get(url)
+        assert response.status_code == 200 and response.content == content
+        recipes_tables = [
+            f'"{model._meta.db_table}"'
+            for model in apps.get_app_config('recipes').get_models(include_auto_created=True)
+        ]
+        assert not any(
+            table in query['sql']
+            for query in context.captured_queries for table in recipes_tables
+        ), (
+            'Проверьте, что повторная выгрузка неизмененного списка покупок '
+            'берется из кэша'
+        )
+        ingredient_in_recipe = IngredientInRecipe.objects.get(recipe=shopping_cart.recipe)
+        ingredient_in_recipe.amount = 5
+        ingredient_in_recipe.save()
+        response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200 and response.headers['ETag'] != etag, (
+            'Проверьте, что после изменения рецепта в списке покупок '
+            'ETag меняется'
+        )
+        assert b'Test_Ingredients 5 liter' in b''.join(response.streaming_content)
+        etag = response.headers['ETag']
+        shopping_cart.recipe.ingredients.add(
+            search_ingredients, through_defaults={'amount': 2}
+        )
+        response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert b'Search_Ingred 2' in b''.join(response.streaming_content)
+        etag = response.headers['ETag']
+        shopping_cart.delete()
+        response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 400, (
+            'Проверьте, что после очистки списка покупок файл не отдается из кэша'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_19_recipe_delete_cart_versions(self, user):
+        from api.cache import get_cart_version
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from recipes.models import Ingredients, Recipes
+
+        def delete_queries(size):
+            recipe = Recipes.objects.create(
+                author=user, name=f'Recipe {size}', text='Test Text', cooking_time=2,
+                image='http://foodgram.example.org/media/recipes/images/image.jpeg'
+            )
+            for num in range(size):
+                recipe.ingredients.add(
+                    Ingredients.objects.create(name=f'{size} {num}', measurement_unit='г'),
+                    through_defaults={'amount': 1}
+                )
+            recipe.shoppingcart_set.create(user=user)
+            version = get_cart_version(user.id)
+            with CaptureQueriesContext(connection) as context:
+                recipe.delete()
+            assert get_cart_version(user.id) != version, (
+                'Проверьте, что удаление рецепта меняет версию списка покупок'
+            )
+            return len(context.captured_queries)
+
+        assert delete_queries(1) == delete_queries(5), (
+            'Проверьте, что количество запросов при удалении рецепта '
+            'не зависит от количества ингридиентов'
+        )